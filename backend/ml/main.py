@@ -1,32 +1,132 @@
+import os
+import io
 import time
+import hashlib
 import argparse
+import logging
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
 from backend.ml.video_engine.analysis_engine import ExerciseAnalyzer
-from backend.ml.video_engine.exercise_logic import PushupLogic, SquatLogic, PullupLogic
-from backend.ml.video_engine.reporting import save_report_as_json
+from backend.ml.video_engine.exercise_logic import EXERCISE_LOGICS
+from backend.ml.video_engine.reporting import save_report_as_json, save_segments_as_json, save_rep_table
+from backend.ml.video_engine.multi_exercise import analyze_video_exercises
+from backend.ml.video_engine.multi_person import analyze_group_video
+from backend.ml.video_engine.segmented import analyze_video_segments
+from backend.ml.video_engine.landmark_cache import LandmarkCache
+from backend.ml.video_engine.instrumentation import StageTimings
+from backend.ml.video_engine.pose_pool import spawn_context
 
-def run_analysis(video_path: str, exercise_type: str, output_path: str):
+def run_analysis(video_path: str, exercise_type: str, output_path: str, frame_stride: int = 1,
+                 max_inference_size: int = None, roi_padding: float = None, workers: int = 1,
+                 landmark_cache: LandmarkCache = None, model_complexity: str = 'full', pipelined: bool = False,
+                 collect_timings: bool = False, rep_table_path: str = None, include_reps_json: bool = False,
+                 multi_person: bool = False, max_people: int = 8, pose_model_path: str = None, on_progress=None):
     """
     Runs the full analysis pipeline and saves the report.
     This is the primary function your frontend team will call.
+    With workers > 1 the video is split into time segments analysed in parallel.
+    A landmark_cache lets re-analysis of the same video skip pose inference.
+    model_complexity picks the pose model: 'lite', 'full' or 'heavy'.
+    pipelined overlaps frame decoding with pose inference (needs frame_stride=1).
+    With collect_timings, per-stage timings are added to the report and logged.
+    exercise_type='auto' detects the exercise(s) performed from a single pose
+    pass and saves/returns one ExerciseSegment per detected bout instead.
+    With multi_person, up to max_people athletes are tracked and one PersonReport
+    per athlete is saved/returned; pose_model_path (default: $POSE_LANDMARKER_MODEL)
+    is the MediaPipe PoseLandmarker .task model this mode needs.
+    The per-rep table is saved to rep_table_path (.npz; one numbered file per
+    segment or person) and/or embedded in the JSON report with include_reps_json.
+    on_progress (if given) is called with the fraction of the video processed.
     """
     print(f"Received request to analyze '{video_path}' for '{exercise_type}'.")
     
-    logic_map = {
-        'pushup': PushupLogic,
-        'squat': SquatLogic,
-        'pullup': PullupLogic
-    }
-    
-    if exercise_type not in logic_map:
+    if exercise_type != 'auto' and exercise_type not in EXERCISE_LOGICS:
         raise ValueError(f"Unknown exercise type: {exercise_type}")
-
-    logic = logic_map[exercise_type]()
     
-    analyzer = ExerciseAnalyzer(exercise_logic=logic)
-    report = analyzer.process_video(video_path)
-    
-    save_report_as_json(report, output_path)
+    analyzer_kwargs = dict(
+        frame_stride=frame_stride,
+        max_inference_size=max_inference_size,
+        roi_padding=roi_padding,
+        model_complexity=model_complexity,
+        pipelined=pipelined
+    )
+    timings = StageTimings(collect_timings)
+    if multi_person:
+        if exercise_type == 'auto': raise ValueError("Multi-person analysis needs a fixed exercise type.")
+        model_path = pose_model_path or os.getenv("POSE_LANDMARKER_MODEL", "pose_landmarker_full.task")
+        people = analyze_group_video(video_path, EXERCISE_LOGICS[exercise_type](), model_path, max_people,
+                                     max_inference_size, timings=timings, on_progress=on_progress)
+        labels = [f"Person {person.person_id} ({person.first_seen_sec}s - {person.last_seen_sec}s)" for person in people]
+        return _save_report_list(people, labels, video_path, exercise_type, output_path, timings, rep_table_path, include_reps_json)
+    if exercise_type == 'auto':
+        segments = analyze_video_exercises(video_path, workers, landmark_cache, timings, on_progress=on_progress, **analyzer_kwargs)
+        labels = [f"Segment {segment.start_sec}s - {segment.end_sec}s: {segment.exercise}" for segment in segments]
+        return _save_report_list(segments, labels, video_path, exercise_type, output_path, timings, rep_table_path, include_reps_json)
+
+    logic = EXERCISE_LOGICS[exercise_type]()
+    if workers > 1:
+        report = analyze_video_segments(video_path, logic, workers, timings=timings, on_progress=on_progress,
+                                        landmark_cache=landmark_cache, **analyzer_kwargs)
+    else:
+        analyzer = ExerciseAnalyzer(exercise_logic=logic, landmark_cache=landmark_cache, timings=timings,
+                                    on_progress=on_progress, **analyzer_kwargs)
+        report = analyzer.process_video(video_path)
     
+    t = timings.start()
+    save_report_as_json(report, output_path, include_reps_json)
+    if rep_table_path: save_rep_table(report.reps, rep_table_path)
+    timings.record('report_writing', t)
+    timings.log(video=video_path, exercise=exercise_type)
+    _print_summary(report)
+    return report
+
+def run_landmark_analysis(landmarks: np.ndarray, fps: float, exercise_type: str, output_path: str,
+                          frame_indices: np.ndarray = None, collect_timings: bool = False,
+                          rep_table_path: str = None, include_reps_json: bool = False):
+    """
+    Scores a pixel-space landmark tensor computed elsewhere (e.g. on the
+    athlete's device; see load_landmark_upload) and saves the report. Only the
+    exercise logic and rep analysis run: there is no video to decode.
+    """
+    print(f"Received request to analyze {len(landmarks)} landmark frames for '{exercise_type}'.")
+
+    if exercise_type not in EXERCISE_LOGICS:
+        raise ValueError(f"Unknown exercise type: {exercise_type}")
+    if not fps > 0:
+        raise ValueError("fps must be positive")
+
+    timings = StageTimings(collect_timings)
+    total_frames = int(frame_indices[-1]) + 1 if frame_indices is not None else len(landmarks)
+    analyzer = ExerciseAnalyzer(exercise_logic=EXERCISE_LOGICS[exercise_type](), batch_rules=True, timings=timings)
+    report = analyzer.evaluate_landmarks(landmarks, fps, total_frames, frame_indices)
+
+    t = timings.start()
+    save_report_as_json(report, output_path, include_reps_json)
+    if rep_table_path: save_rep_table(report.reps, rep_table_path)
+    timings.record('report_writing', t)
+    timings.log(exercise=exercise_type, frames=len(landmarks))
+    _print_summary(report)
+    return report
+
+def _save_report_list(items: list, labels: list, video_path, exercise_type, output_path, timings, rep_table_path, include_reps_json):
+    """Saves and prints a list of ExerciseSegment / PersonReport; rep tables get one .npz each."""
+    t = timings.start()
+    save_segments_as_json(items, output_path, include_reps_json)
+    if rep_table_path:
+        base, _ = os.path.splitext(rep_table_path)
+        for i, item in enumerate(items):
+            save_rep_table(item.report.reps, f"{base}_{i}.npz")
+    timings.record('report_writing', t)
+    timings.log(video=video_path, exercise=exercise_type)
+    for label, item in zip(labels, items):
+        print(f"\n{label}")
+        _print_summary(item.report)
+    if not items: print("\nNothing to report: no athlete or known exercise was detected in the video.")
+    return items
+
+def _print_summary(report):
     print("\n" + "="*50)
     print("           ANALYSIS SUMMARY (FOR DEMO)")
     print("="*50)
@@ -40,16 +140,137 @@ def run_analysis(video_path: str, exercise_type: str, output_path: str):
             print(f"    - {issue}")
     print("="*50)
 
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm', '.flv')
+
+def _read_batch_inputs(source: str, exercise_type: str):
+    """
+    Lists (video_path, exercise_type) pairs from a directory of videos, or from a
+    manifest with one `video_path[,exercise_type]` per line (# starts a comment).
+    """
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(VIDEO_EXTENSIONS))
+        return [(os.path.join(source, n), exercise_type) for n in names]
+
+    items = []
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line: continue
+            path, _, exercise = (part.strip() for part in line.partition(','))
+            items.append((os.path.join(base_dir, path), exercise or exercise_type))
+    return items
+
+def _batch_report_path(video_path: str, exercise_type: str, root: str, output_dir: str) -> str:
+    """
+    Report path for one batch item. Stems repeat across subdirectories and
+    extensions (and a manifest may list a video once per exercise), so the name
+    carries a short hash of the path relative to the batch root and the exercise.
+    """
+    item = f"{os.path.relpath(video_path, root)}\n{exercise_type}"
+    digest = hashlib.sha256(item.encode()).hexdigest()[:10]
+    return os.path.join(output_dir, f"{os.path.splitext(os.path.basename(video_path))[0]}_{digest}_report.json")
+
+def _run_batch_item(video_path: str, exercise_type: str, output_path: str, options: dict):
+    """Worker: analyses one video quietly and returns (frames, seconds)."""
+    start_time = time.perf_counter()
+    cap = cv2.VideoCapture(video_path)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    options = dict(options)
+    cache_dir = options.pop('cache_dir', None)
+    cache = LandmarkCache(cache_dir) if cache_dir else None
+    tmp_path = output_path + '.tmp'
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_analysis(video_path, exercise_type, tmp_path, landmark_cache=cache, **options)
+    # Only a complete report marks the video as done for resumption
+    os.replace(tmp_path, output_path)
+    return frames, time.perf_counter() - start_time
+
+def run_batch(source: str, exercise_type: str, output_dir: str, workers: int = 1, **options):
+    """
+    Analyses every video of a directory or manifest across a process pool, writing
+    one JSON report per video to output_dir. Videos whose report already exists
+    are skipped, so an interrupted run resumes where it stopped. Prints aggregate
+    throughput at the end.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    root = source if os.path.isdir(source) else os.path.dirname(os.path.abspath(source))
+    items = [(video, exercise, _batch_report_path(video, exercise, root, output_dir))
+             for video, exercise in _read_batch_inputs(source, exercise_type)]
+    pending = [item for item in items if not os.path.exists(item[2])]
+    print(f"Batch: {len(items)} videos, {len(items) - len(pending)} already done, {len(pending)} to analyse with {workers} workers.")
+
+    latencies, total_frames, failures = [], 0, 0
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=spawn_context()) as pool:
+        futures = {
+            pool.submit(_run_batch_item, video, exercise, report_path, options): video
+            for video, exercise, report_path in pending
+        }
+        for future in as_completed(futures):
+            video = futures[future]
+            try:
+                frames, seconds = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"  FAILED  {video}: {e}")
+                continue
+            latencies.append(seconds)
+            total_frames += frames
+            print(f"  done    {video} ({frames} frames, {seconds:.1f}s)")
+    elapsed = time.perf_counter() - start_time
+
+    print("\n" + "="*50)
+    print("           BATCH THROUGHPUT")
+    print("="*50)
+    print(f"  - Videos Analysed:      {len(latencies)} ({failures} failed)")
+    print(f"  - Wall Time:            {elapsed:.1f}s")
+    if latencies:
+        print(f"  - Videos/min:           {len(latencies) / elapsed * 60:.2f}")
+        print(f"  - Frames/sec:           {total_frames / elapsed:.1f}")
+        print(f"  - Latency p50:          {np.percentile(latencies, 50):.2f}s")
+        print(f"  - Latency p95:          {np.percentile(latencies, 95):.2f}s")
+    print("="*50)
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="AI-Powered Exercise Analysis Engine")
-    parser.add_argument("--video", type=str, required=True, help="Path to the video file.")
-    parser.add_argument("--exercise", type=str, required=True, choices=['pushup', 'squat', 'pullup'], help="The exercise to analyze.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", type=str, help="Path to the video file.")
+    source.add_argument("--batch", type=str, help="Directory of videos, or a manifest of `video_path[,exercise]` lines.")
+    parser.add_argument("--exercise", type=str, required=True, choices=['pushup', 'squat', 'pullup', 'auto'], help="The exercise to analyze, or 'auto' to detect it.")
     parser.add_argument("--output_json", type=str, default="analysis_report.json", help="Path to save the JSON report.")
+    parser.add_argument("--output_dir", type=str, default="reports", help="Directory for per-video reports in --batch mode.")
+    parser.add_argument("--stride", type=int, default=1, help="Run pose inference on every Nth frame (adaptive).")
+    parser.add_argument("--max_size", type=int, default=None, help="Cap the longest side of the inference image (pixels).")
+    parser.add_argument("--roi_padding", type=float, default=None, help="Crop inference to the person's bounding box, padded by this fraction.")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel processes: time segments of one video, or whole videos with --batch.")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Directory for cached pose landmarks.")
+    parser.add_argument("--model_complexity", type=str, default='full', choices=['lite', 'full', 'heavy'], help="Pose model: faster (lite) or more accurate (heavy).")
+    parser.add_argument("--pipelined", action="store_true", help="Decode frames on a background thread while inference runs.")
+    parser.add_argument("--timings", action="store_true", help="Collect per-stage timings into the report and log them.")
+    parser.add_argument("--reps_npz", type=str, default=None, help="Path to save the per-rep table (compressed .npz).")
+    parser.add_argument("--reps_json", action="store_true", help="Also include the per-rep table in the JSON report.")
+    parser.add_argument("--multi_person", action="store_true", help="Track several athletes and report on each.")
+    parser.add_argument("--max_people", type=int, default=8, help="Most athletes to detect per frame with --multi_person.")
+    parser.add_argument("--pose_model", type=str, default=None, help="PoseLandmarker .task model for --multi_person.")
     args = parser.parse_args()
+    if args.timings: logging.basicConfig(level=logging.INFO, format="%(message)s")
 
     start_time = time.time()
     try:
-        run_analysis(args.video, args.exercise, args.output_json)
+        if args.batch:
+            run_batch(args.batch, args.exercise, args.output_dir, args.workers, frame_stride=args.stride,
+                      max_inference_size=args.max_size, roi_padding=args.roi_padding, cache_dir=args.cache_dir,
+                      model_complexity=args.model_complexity, pipelined=args.pipelined, collect_timings=args.timings,
+                      include_reps_json=args.reps_json, multi_person=args.multi_person, max_people=args.max_people,
+                      pose_model_path=args.pose_model)
+        else:
+            cache = LandmarkCache(args.cache_dir) if args.cache_dir else None
+            run_analysis(args.video, args.exercise, args.output_json, args.stride, args.max_size, args.roi_padding, args.workers, cache,
+                         args.model_complexity, args.pipelined, args.timings, args.reps_npz, args.reps_json,
+                         args.multi_person, args.max_people, args.pose_model)
     except Exception as e:
         print(f"\nAN ERROR OCCURRED: {e}")
         print("Analysis failed. Please check the video file and exercise type.")
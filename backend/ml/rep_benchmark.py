@@ -0,0 +1,103 @@
+import time
+import argparse
+import contextlib
+import io
+import numpy as np
+from scipy.signal import find_peaks
+from backend.ml.video_engine.analysis_engine import ExerciseAnalyzer
+from backend.ml.video_engine.rep_detector import RepDetector
+
+def legacy_analyze_reps(angle_timeseries: list, fps: float):
+    """The original per-trough implementation of ExerciseAnalyzer._analyze_reps, kept as the reference."""
+    angles = np.array([angle if angle is not None else 180 for angle in angle_timeseries])
+    troughs, _ = find_peaks(-angles, prominence=30, distance=fps*0.5)
+    if len(troughs) == 0: return [], [], []
+
+    rep_times, min_angles, rep_spans = [], [], []
+    for i in range(len(troughs)):
+        start_frame, end_frame = 0, len(angles) -1
+        if i > 0: start_frame = troughs[i-1]
+        if i < len(troughs) -1: end_frame = troughs[i+1]
+
+        peaks_before, _ = find_peaks(angles[start_frame:troughs[i]], prominence=30)
+        peaks_after, _ = find_peaks(angles[troughs[i]:end_frame], prominence=30)
+
+        if peaks_before.size > 0 and peaks_after.size > 0:
+            start_peak = start_frame + peaks_before[-1]
+            end_peak = troughs[i] + peaks_after[0]
+            time_taken = (end_peak - start_peak) / fps
+            if 0.4 < time_taken < 5.0:
+                rep_times.append(time_taken)
+                min_angles.append(angles[troughs[i]])
+                rep_spans.append((start_peak, end_peak))
+    return rep_times, min_angles, rep_spans
+
+def synthetic_angles(seconds: float, fps: float, seed: int, dropouts: bool = False):
+    """A rep-like main-angle signal with varying tempo, depth and noise, as float32 with NaN gaps."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * fps)
+    tempo = np.clip(np.cumsum(rng.normal(0, 0.002, n)) + rng.uniform(0.3, 0.9), 0.2, 1.2)
+    phase = np.cumsum(2 * np.pi * tempo / fps)
+    depth = rng.uniform(30, 60)
+    angles = (180 - depth) + depth * np.cos(phase) + rng.normal(0, rng.uniform(0.5, 4), n)
+    angles = angles.astype(np.float32)
+    if dropouts:
+        for start in rng.integers(0, n, size=n // 3000):
+            angles[start:start + rng.integers(1, 40)] = np.nan
+    return angles
+
+def streaming_reps(angles, fps: float):
+    """Counts reps frame by frame with the RepDetector used by live sessions and online_reps."""
+    detector = RepDetector(fps)
+    for angle in angles.tolist():
+        detector.update(angle)
+    return detector.count
+
+def run_benchmark(hours: float, fps: float, seeds: int, dropouts: bool):
+    """
+    Times the legacy and vectorized rep analysis on synthetic signals and
+    checks their outputs match, then compares the streaming RepDetector's
+    count against the vectorized one.
+    """
+    analyzer = ExerciseAnalyzer.__new__(ExerciseAnalyzer)
+    print("="*94)
+    print(f"  {'Seed':>4}{'Frames':>10}{'Reps':>7}{'Legacy':>11}{'Vectorized':>12}{'Speedup':>10}{'Identical':>11}"
+          f"{'Streaming':>11}{'Stream reps':>13}")
+    print("="*94)
+    for seed in range(seeds):
+        angles = synthetic_angles(hours * 3600, fps, seed, dropouts)
+        angle_list = [None if np.isnan(a) else float(a) for a in angles]
+
+        start_time = time.perf_counter()
+        legacy = legacy_analyze_reps(angle_list, fps)
+        legacy_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            vectorized = analyzer._analyze_reps(angles, fps)
+        vectorized_time = time.perf_counter() - start_time
+
+        identical = (
+            [tuple(map(int, span)) for span in legacy[2]] == [tuple(map(int, span)) for span in vectorized[2]]
+            and np.allclose(legacy[0], vectorized[0]) and np.allclose(legacy[1], vectorized[1])
+        )
+
+        start_time = time.perf_counter()
+        stream_count = streaming_reps(angles, fps)
+        streaming_time = time.perf_counter() - start_time
+
+        print(f"  {seed:>4}{len(angles):>10}{len(legacy[0]):>7}{legacy_time:>10.3f}s{vectorized_time:>11.3f}s"
+              f"{legacy_time / vectorized_time:>9.1f}x{'yes' if identical else 'NO':>11}"
+              f"{streaming_time:>10.3f}s{stream_count - len(vectorized[0]):>+13d}")
+    print("="*94)
+    print("  Stream reps: streaming count minus vectorized count")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized rep analysis against the legacy loop and the streaming detector")
+    parser.add_argument("--hours", type=float, default=1.0, help="Length of each synthetic signal.")
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate of the synthetic signal.")
+    parser.add_argument("--seeds", type=int, default=5, help="Number of random signals.")
+    parser.add_argument("--dropouts", action='store_true', help="Insert short missing-pose gaps.")
+    args = parser.parse_args()
+
+    run_benchmark(args.hours, args.fps, args.seeds, args.dropouts)
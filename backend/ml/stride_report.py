@@ -0,0 +1,44 @@
+import time
+import argparse
+from backend.ml.video_engine.analysis_engine import ExerciseAnalyzer
+from backend.ml.video_engine.exercise_logic import EXERCISE_LOGICS
+
+def run_stride_report(video_paths: list, exercise_type: str, strides: list):
+    """
+    Analyses each video at stride 1 and at every stride in `strides`, and prints
+    rep count, average rep time and wall time against the stride-1 baseline.
+    """
+    if exercise_type not in EXERCISE_LOGICS:
+        raise ValueError(f"Unknown exercise type: {exercise_type}")
+
+    rows = []
+    for video_path in video_paths:
+        baseline = None
+        for stride in [1] + [s for s in strides if s != 1]:
+            analyzer = ExerciseAnalyzer(exercise_logic=EXERCISE_LOGICS[exercise_type](), frame_stride=stride)
+            start_time = time.time()
+            report = analyzer.process_video(video_path)
+            elapsed = time.time() - start_time
+            if baseline is None: baseline = (report, elapsed)
+            rows.append((video_path, stride, report, elapsed, baseline))
+
+    print("\n" + "="*86)
+    print(f"  {'Video':<30}{'Stride':>7}{'Reps':>6}{'dReps':>7}{'Avg Rep':>9}{'dAvg':>8}{'Time':>9}{'Speedup':>9}")
+    print("="*86)
+    for video_path, stride, report, elapsed, (base_report, base_elapsed) in rows:
+        d_reps = report.total_repetitions - base_report.total_repetitions
+        d_avg = report.average_rep_time - base_report.average_rep_time
+        speedup = base_elapsed / elapsed if elapsed > 0 else 0
+        print(f"  {video_path[-30:]:<30}{stride:>7}{report.total_repetitions:>6}{d_reps:>+7}"
+              f"{report.average_rep_time:>8.2f}s{d_avg:>+7.2f}s{elapsed:>8.2f}s{speedup:>8.2f}x")
+    print("="*86)
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Accuracy vs. frame stride report for the analysis engine")
+    parser.add_argument("--videos", type=str, nargs='+', required=True, help="Paths to the video files.")
+    parser.add_argument("--exercise", type=str, required=True, choices=sorted(EXERCISE_LOGICS), help="The exercise to analyze.")
+    parser.add_argument("--strides", type=int, nargs='+', default=[2, 3, 4, 6], help="Strides to compare against stride 1.")
+    args = parser.parse_args()
+
+    run_stride_report(args.videos, args.exercise, args.strides)
@@ -1,15 +1,81 @@
 import cv2
 import numpy as np
 import mediapipe as mp
-from scipy.signal import find_peaks
+from scipy.signal import find_peaks, peak_prominences
 from backend.ml.video_engine.exercise_logic import ExerciseLogic
-from backend.ml.video_engine.reporting import AnalysisReport
+from backend.ml.video_engine.landmarks import NUM_LANDMARKS, VISIBILITY, landmarks_to_array
+from backend.ml.video_engine.preprocessing import FramePreprocessor
+from backend.ml.video_engine.reporting import AnalysisReport, RepTable
+from backend.ml.video_engine.sampling import AdaptiveSampler, resample_angles
+from backend.ml.video_engine.timeseries import SignalSeries
+from backend.ml.video_engine.rep_detector import RepDetector
+from backend.ml.video_engine.landmark_cache import LandmarkCache
+from backend.ml.video_engine.frame_reader import ThreadedFrameReader
+from backend.ml.video_engine.instrumentation import StageTimings
+from backend.ml.video_engine.pose_pool import PosePool, get_pose_pool, pose_config
+
+# Bump whenever a change alters the reports, so stored results are recomputed
+ENGINE_VERSION = 1
 
 class ExerciseAnalyzer:
     """The core engine that processes video and generates an analysis."""
-    def __init__(self, exercise_logic: ExerciseLogic):
+    def __init__(self, exercise_logic: ExerciseLogic, batch_rules: bool = False, frame_stride: int = 1,
+                 max_inference_size: int = None, roi_padding: float = None, online_reps: bool = False, on_rep=None,
+                 landmark_cache: LandmarkCache = None, model_complexity='full', pose_pool: PosePool = None,
+                 pipelined: bool = False, timings: StageTimings = None, on_progress=None):
+        """
+        With batch_rules=True, pass 1 only stores a (frames, 33, 4) landmark tensor
+        and every form rule is evaluated afterwards in one vectorized pass
+        (see evaluate_landmarks), so a session can be re-scored without re-decoding.
+
+        With frame_stride > 1, pose inference runs on every Nth frame (densifying
+        around direction changes, see AdaptiveSampler); skipped frames are grabbed
+        but never decoded.
+
+        max_inference_size caps the longest side of the image given to the pose
+        model, and roi_padding enables cropping to the person's padded bounding box
+        from the previous frame (see FramePreprocessor). Landmarks are always
+        returned in full-frame coordinates.
+
+        With online_reps=True, reps are detected while frames are decoded by a
+        streaming RepDetector instead of the find_peaks pass 2, and on_rep (if
+        given) is called with each RepEvent as soon as it completes.
+
+        With a landmark_cache, the pass-1 landmark tensor is stored under a hash
+        of the video and pose config, and a cached tensor is scored directly
+        (as in batch_rules mode) without decoding the video.
+
+        model_complexity selects the pose model ('lite', 'full' or 'heavy', or
+        0-2). Pose instances are checked out of pose_pool (default: the
+        process-wide pool) for the duration of each extraction, so repeated
+        analyses reuse warm graphs instead of rebuilding them.
+
+        With pipelined=True, frames are decoded on a background thread
+        (ThreadedFrameReader) while the pose model runs on the previous ones.
+        Adaptive sampling picks the next frame from the last inference, so this
+        needs frame_stride=1.
+
+        With timings (a StageTimings), wall time of every pipeline stage is
+        recorded and attached to the report; by default nothing is measured.
+
+        on_progress (if given) is called with the fraction of the video
+        processed so far, whenever progress is printed.
+        """
+        if pipelined and frame_stride > 1:
+            raise ValueError("Pipelined extraction requires frame_stride=1.")
         self.logic = exercise_logic
-        self.pose = mp.solutions.pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        self.batch_rules = batch_rules
+        self.frame_stride = frame_stride
+        self.max_inference_size = max_inference_size
+        self.roi_padding = roi_padding
+        self.online_reps = online_reps
+        self.on_rep = on_rep
+        self.landmark_cache = landmark_cache
+        self.pose_config = pose_config(model_complexity)
+        self.pose_pool = pose_pool or get_pose_pool()
+        self.pipelined = pipelined
+        self.timings = timings or StageTimings(enabled=False)
+        self.on_progress = on_progress
 
     def _extract_data(self, video_path: str):
         cap = cv2.VideoCapture(video_path)
@@ -19,70 +85,204 @@ class ExerciseAnalyzer:
         fps = cap.get(cv2.CAP_PROP_FPS)
         if fps == 0: fps = 30 # Default FPS if not available
 
-        angle_timeseries, form_feedback = [], set()
+        series = SignalSeries(total_frames, ('main_angle', 'visibility'), self.logic.get_form_messages())
+        main_angle, visibility = series.signals['main_angle'], series.signals['visibility']
         rep_state = 'up'
+        sampler = AdaptiveSampler(self.frame_stride) if self.frame_stride > 1 else None
+        preprocessor = FramePreprocessor(self.max_inference_size, self.roi_padding)
+        rep_detector = RepDetector(fps) if self.online_reps else None
+        self.rep_events = []
+        if self.pipelined: cap = ThreadedFrameReader(cap)
 
         print("Starting Pass 1: Fast Data Extraction...")
-        for frame_idx in range(total_frames):
-            ret, frame = cap.read()
-            if not ret: break
+        frame_idx = 0
+        try:
+            with self.pose_pool.acquire(**self.pose_config) as pose:
+                # The container's frame count is only an estimate: read until the stream ends
+                while True:
+                    t = self.timings.start()
+                    ret, frame = cap.read()
+                    if not ret: break
+                    t = self.timings.record('decode', t)
 
-            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.pose.process(image)
+                    image, (x0, y0, crop_w, crop_h) = preprocessor.prepare(frame)
+                    t = self.timings.record('preprocess', t)
+                    results = pose.process(image)
+                    t = self.timings.record('inference', t)
 
-            current_angle = None
-            if results.pose_landmarks:
-                landmarks = results.pose_landmarks.landmark
-                current_angle = self.logic.get_main_angle(landmarks, frame.shape)
-                angle_timeseries.append(current_angle)
+                    current_angle, points = None, None
+                    row = series.append(frame_idx)
+                    if results.pose_landmarks:
+                        points = landmarks_to_array(results.pose_landmarks.landmark, (crop_h, crop_w), (x0, y0))
+                        angles = self.logic.compute_angles(points)
+                        current_angle = self.logic.get_main_angle(points, angles)
+                        series.values[row, visibility] = points[:, VISIBILITY].mean()
 
-                if current_angle is not None:
-                    if current_angle < 100: rep_state = 'down'
-                    if current_angle > 150: rep_state = 'up'
+                        if current_angle is not None:
+                            series.values[row, main_angle] = current_angle
+                            if current_angle < self.logic.DOWN_THRESHOLD: rep_state = 'down'
+                            if current_angle > self.logic.UP_THRESHOLD: rep_state = 'up'
 
-                form_feedback.update(self.logic.get_form_feedback(landmarks, frame.shape, rep_state))
-            else:
-                angle_timeseries.append(None)
+                        masks = self.logic.get_form_masks(points, angles, np.asarray(rep_state == 'down'))
+                        series.flags[row] = list(masks.values())
+                    t = self.timings.record('logic', t)
+                    preprocessor.update(points, frame.shape)
 
-            if (frame_idx + 1) % 30 == 0:
-                print(f"Progress: {((frame_idx + 1) / total_frames) * 100:.2f}%", end='\r')
+                    if rep_detector:
+                        rep = rep_detector.update(current_angle, frame_idx)
+                        if rep:
+                            self.rep_events.append(rep)
+                            if self.on_rep: self.on_rep(rep)
 
-        cap.release()
+                    if series.length % 30 == 0:
+                        progress = min(1.0, (frame_idx + 1) / max(1, total_frames))
+                        print(f"Progress: {progress * 100:.2f}%", end='\r')
+                        if self.on_progress: self.on_progress(progress)
+
+                    step = sampler.next_step(current_angle) if sampler else 1
+                    t = self.timings.start()
+                    frame_idx = self._skip_frames(cap, frame_idx + 1, step - 1)
+                    if step > 1: self.timings.record('grab', t)
+        finally:
+            cap.release()
         print("\nPass 1 Complete.")
-        return angle_timeseries, list(form_feedback), fps, total_frames
+        return series, fps, max(total_frames, frame_idx)
+
+    def _skip_frames(self, cap, frame_idx: int, count: int, end_frame: int = None) -> int:
+        """Advances past `count` frames (stopping at end_frame, if given) with grab() so they are never decoded."""
+        if end_frame is not None: count = min(count, end_frame - frame_idx)
+        for _ in range(count):
+            if not cap.grab(): break
+            frame_idx += 1
+        return frame_idx
+
+    def _extract_landmarks(self, video_path: str, start_frame: int = 0, end_frame: int = None):
+        """
+        Pass 1 for batch_rules mode: pose inference only, no per-frame logic.
+        start_frame / end_frame restrict extraction to a segment of the video
+        (seeking via CAP_PROP_POS_FRAMES); returned frame indices are absolute.
+        Without end_frame, frames are read until the stream ends, whatever
+        CAP_PROP_FRAME_COUNT claims.
+        """
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened(): raise IOError(f"Could not open video file: {video_path}")
+
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if fps == 0: fps = 30 # Default FPS if not available
+
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            # Some containers can only seek to a keyframe; trust where we actually landed
+            start_frame = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+        expected = (total_frames if end_frame is None else end_frame) - start_frame
+        # Samples without a detected pose stay NaN; doubled if the frame count was under-reported
+        landmarks = np.full((max(1, expected), NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        frame_indices = []
+        sampler = AdaptiveSampler(self.frame_stride) if self.frame_stride > 1 else None
+        preprocessor = FramePreprocessor(self.max_inference_size, self.roi_padding)
+        if self.pipelined: cap = ThreadedFrameReader(cap, None if end_frame is None else end_frame - start_frame)
+
+        print("Starting Pass 1: Landmark Extraction...")
+        frame_idx = start_frame
+        try:
+            with self.pose_pool.acquire(**self.pose_config) as pose:
+                while end_frame is None or frame_idx < end_frame:
+                    t = self.timings.start()
+                    ret, frame = cap.read()
+                    if not ret: break
+                    t = self.timings.record('decode', t)
 
-    def _analyze_reps(self, angle_timeseries: list, fps: float):
+                    image, (x0, y0, crop_w, crop_h) = preprocessor.prepare(frame)
+                    t = self.timings.record('preprocess', t)
+                    results = pose.process(image)
+                    t = self.timings.record('inference', t)
+                    sample = len(frame_indices)
+                    if sample == len(landmarks):
+                        landmarks = np.concatenate([landmarks, np.full_like(landmarks, np.nan)])
+                    if results.pose_landmarks:
+                        landmarks[sample] = landmarks_to_array(results.pose_landmarks.landmark, (crop_h, crop_w), (x0, y0))
+                    preprocessor.update(landmarks[sample] if results.pose_landmarks else None, frame.shape)
+                    frame_indices.append(frame_idx)
+
+                    if len(frame_indices) % 30 == 0:
+                        progress = min(1.0, (frame_idx + 1 - start_frame) / max(1, expected))
+                        print(f"Progress: {progress * 100:.2f}%", end='\r')
+                        if self.on_progress: self.on_progress(progress)
+
+                    step = 1
+                    if sampler:
+                        current_angle = self.logic.get_main_angle(landmarks[sample]) if results.pose_landmarks else None
+                        step = sampler.next_step(current_angle)
+                    t = self.timings.start()
+                    frame_idx = self._skip_frames(cap, frame_idx + 1, step - 1, end_frame)
+                    if step > 1: self.timings.record('grab', t)
+        finally:
+            cap.release()
+        print("\nPass 1 Complete.")
+        return landmarks[:len(frame_indices)], fps, max(total_frames, frame_idx), np.array(frame_indices)
+
+    def evaluate_form(self, landmarks: np.ndarray):
+        """
+        Evaluates the main angle and every form rule over a whole (frames, 33, 4)
+        landmark tensor at once. Returns the main-angle series (NaN where no pose
+        was found) and a dict of per-frame boolean masks keyed by feedback string.
+        """
+        angles = self.logic.compute_angles(landmarks)
+        main_angles = angles[self.logic.MAIN_ANGLE]
+        down = self.logic.get_down_mask(main_angles)
+        return main_angles, self.logic.get_form_masks(landmarks, angles, down)
+
+    def _analyze_reps(self, angle_timeseries, fps: float):
+        """
+        Finds troughs and peaks of the main angle once over the whole signal and
+        pairs every trough with the last peak before it and the first peak after
+        it in one vectorized pass. Returns rep times, min angles, (start, end)
+        frame spans and bottom (trough) frames.
+        """
         print("Starting Pass 2: Signal Processing and Rep Analysis...")
-        # Replace None with a neutral angle (e.g., 180) for processing
-        angles = np.array([angle if angle is not None else 180 for angle in angle_timeseries])
+        # Missing poses (NaN) are treated as a neutral, fully extended angle
+        angles = np.nan_to_num(np.asarray(angle_timeseries, dtype=np.float32), nan=180.0)
         
         # More robust peak detection
         troughs, _ = find_peaks(-angles, prominence=30, distance=fps*0.5)
         
-        if len(troughs) == 0: return [], [], []
-
-        rep_times, min_angles = [], []
-        for i in range(len(troughs)):
-            start_frame, end_frame = 0, len(angles) -1
-            if i > 0: start_frame = troughs[i-1]
-            if i < len(troughs) -1: end_frame = troughs[i+1]
-
-            # Find the peaks (highest angle) before and after the trough
-            peaks_before, _ = find_peaks(angles[start_frame:troughs[i]], prominence=30)
-            peaks_after, _ = find_peaks(angles[troughs[i]:end_frame], prominence=30)
-
-            if peaks_before.size > 0 and peaks_after.size > 0:
-                start_peak = start_frame + peaks_before[-1]
-                end_peak = troughs[i] + peaks_after[0]
-                
-                time_taken = (end_peak - start_peak) / fps
-                # Filter out reps that are too fast or too slow
-                if 0.4 < time_taken < 5.0:
-                    rep_times.append(time_taken)
-                    min_angles.append(angles[troughs[i]])
+        if len(troughs) == 0: return [], [], [], []
+
+        # Peaks only count within the stretch between two troughs (the last
+        # frame excluded), so a wall higher than any angle is placed at each
+        # boundary; prominences can then be measured in one global call
+        boundaries = np.append(troughs, len(angles) - 1)
+        walled = np.insert(angles, boundaries, np.float32(1e6))
+        walls = boundaries + np.arange(len(boundaries))
+        peaks, _ = find_peaks(walled)
+        peaks = peaks[~np.isin(peaks, walls)]
+        peaks = peaks[peak_prominences(walled, peaks)[0] >= 30]
+        peaks = peaks - np.searchsorted(walls, peaks)
+
+        # Last peak before each trough and first peak after it, each within the neighbouring troughs
+        window_start = np.concatenate(([0], troughs[:-1]))
+        window_end = np.concatenate((troughs[1:], [len(angles) - 1]))
+        before = np.searchsorted(peaks, troughs) - 1
+        after = np.searchsorted(peaks, troughs, side='right')
+        padded = np.append(peaks, -1)
+        start_peak, end_peak = padded[before], padded[after]
+
+        valid = (before >= 0) & (start_peak > window_start)
+        valid &= (after < len(peaks)) & (end_peak < window_end)
+
+        time_taken = (end_peak - start_peak) / fps
+        # Filter out reps that are too fast or too slow
+        valid &= (time_taken > 0.4) & (time_taken < 5.0)
+
+        rep_times = time_taken[valid].tolist()
+        min_angles = angles[troughs[valid]].tolist()
+        rep_spans = list(zip(start_peak[valid].tolist(), end_peak[valid].tolist()))
+        rep_bottoms = troughs[valid].tolist()
 
         print("Pass 2 Complete.")
-        return rep_times, min_angles
+        return rep_times, min_angles, rep_spans, rep_bottoms
 
     def _get_workout_intensity(self, avg_rep_time: float) -> str:
         if avg_rep_time == 0: return 'N/A'
@@ -90,14 +290,83 @@ class ExerciseAnalyzer:
         if avg_rep_time > 1.5: return 'Moderate'
         return 'High'
     
+    def _cache_config(self) -> dict:
+        """Everything that affects the extracted landmark tensor."""
+        config = dict(
+            self.pose_config,
+            mediapipe=getattr(mp, '__version__', None),
+            frame_stride=self.frame_stride,
+            max_inference_size=self.max_inference_size,
+            roi_padding=self.roi_padding,
+        )
+        # Adaptive sampling follows the main angle, so the sampled frames depend on the logic
+        if self.frame_stride > 1: config['logic'] = self.logic.__class__.__name__
+        return config
+
+    def load_landmarks(self, video_path: str):
+        """
+        Pass 1 of batch_rules mode, served from the landmark cache when one is set.
+        Returns (landmarks, fps, total_frames, frame_indices).
+        """
+        if self.landmark_cache is None: return self._extract_landmarks(video_path)
+
+        key = self.landmark_cache.key(video_path, self._cache_config())
+        cached = self.landmark_cache.load(key)
+        if cached is not None:
+            print("Pass 1 skipped: using cached landmarks.")
+            return cached
+        landmarks, fps, total_frames, frame_indices = self._extract_landmarks(video_path)
+        self.landmark_cache.store(key, landmarks, fps, total_frames, frame_indices)
+        return landmarks, fps, total_frames, frame_indices
+
     def process_video(self, video_path: str) -> AnalysisReport:
-        angle_data, form_feedback, fps, total_frames = self._extract_data(video_path)
-        rep_times, min_angles = self._analyze_reps(angle_data, fps)
+        if self.batch_rules or self.landmark_cache is not None:
+            landmarks, fps, total_frames, frame_indices = self.load_landmarks(video_path)
+            return self.evaluate_landmarks(landmarks, fps, total_frames, frame_indices)
+
+        series, fps, total_frames = self._extract_data(video_path)
+        angle_data, frame_indices, masks = series.signal('main_angle'), series.frame_indices[:series.length], series.flag_masks()
+        form_feedback = [message for message, mask in masks.items() if mask.any()]
+        if self.online_reps:
+            return self._build_report(angle_data, form_feedback, fps, total_frames, masks, frame_indices, reps=self.rep_events)
+        if self.frame_stride > 1 and len(frame_indices):
+            angle_data = resample_angles(angle_data, frame_indices, frame_indices[-1] + 1)
+        return self._build_report(angle_data, form_feedback, fps, total_frames, masks, frame_indices)
+
+    def evaluate_landmarks(self, landmarks: np.ndarray, fps: float, total_frames: int = None, frame_indices: np.ndarray = None) -> AnalysisReport:
+        """
+        Scores a stored landmark tensor without touching the video. The report
+        additionally lists, for each form issue, the indices of the reps it fired in.
+        frame_indices gives the source frame of each row when the video was sampled
+        with a stride; by default rows are consecutive frames.
+        """
+        if total_frames is None: total_frames = len(landmarks)
+        t = self.timings.start()
+        main_angles, masks = self.evaluate_form(landmarks)
+        self.timings.record('logic', t)
+        angle_data = main_angles.astype(np.float32)
+        form_feedback = [message for message, mask in masks.items() if mask.any()]
+        if frame_indices is not None and len(frame_indices) > 0 and frame_indices[-1] + 1 > len(frame_indices):
+            angle_data = resample_angles(angle_data, frame_indices, frame_indices[-1] + 1)
+        return self._build_report(angle_data, form_feedback, fps, total_frames, masks, frame_indices)
+
+    def _build_report(self, angle_data, form_feedback, fps, total_frames, form_masks=None, frame_indices=None, reps=None) -> AnalysisReport:
+        if reps is None:
+            t = self.timings.start()
+            rep_times, min_angles, rep_spans, rep_bottoms = self._analyze_reps(angle_data, fps)
+            self.timings.record('signal_processing', t)
+        else:
+            rep_times = [rep.duration for rep in reps]
+            min_angles = [rep.min_angle for rep in reps]
+            rep_spans = [(rep.start_frame, rep.end_frame) for rep in reps]
+            rep_bottoms = [rep.bottom_frame for rep in reps]
         
         total_reps = len(rep_times)
         workout_duration = total_frames / fps
         avg_rep_time = round(np.mean(rep_times), 2) if total_reps > 0 else 0
         min_angle_range = (round(np.min(min_angles), 2), round(np.max(min_angles), 2)) if total_reps > 0 else (0,0)
+
+        rep_table = self._build_rep_table(rep_spans, rep_bottoms, rep_times, min_angles, fps, form_masks, frame_indices)
         
         if total_reps == 0:
             form_feedback.append("No valid reps were detected. This could mean the wrong exercise was selected, or the camera angle makes it difficult to see your form.")
@@ -109,5 +378,39 @@ class ExerciseAnalyzer:
             average_rep_time=avg_rep_time,
             min_angle_range=min_angle_range,
             workout_intensity=self._get_workout_intensity(avg_rep_time),
-            form_feedback=sorted(form_feedback)
-        )
\ No newline at end of file
+            form_feedback=sorted(form_feedback),
+            form_issue_reps=rep_table.form_issue_reps(),
+            timings=self.timings.summary() if self.timings.enabled else None,
+            reps=rep_table
+        )
+
+    def _build_rep_table(self, rep_spans, rep_bottoms, rep_times, min_angles, fps, form_masks=None, frame_indices=None) -> RepTable:
+        """
+        Assembles the per-rep columns. A form flag is set for a rep when its mask
+        fired on any sampled frame within the rep's [start, end] span.
+        """
+        spans = np.array(rep_spans, dtype=np.int64).reshape(-1, 2)
+        start, end = spans[:, 0], spans[:, 1]
+        bottom = np.array(rep_bottoms, dtype=np.int64)
+        eccentric, concentric = (bottom - start) / fps, (end - bottom) / fps
+        if not self.logic.ANGLE_CLOSES_ECCENTRIC: eccentric, concentric = concentric, eccentric
+
+        flag_names = list(form_masks) if form_masks is not None else []
+        flags = np.zeros((len(spans), len(flag_names)), dtype=bool)
+        if flag_names:
+            frames = np.arange(len(next(iter(form_masks.values())))) if frame_indices is None else np.asarray(frame_indices)
+            for i, mask in enumerate(form_masks.values()):
+                fired = frames[mask] # sorted, as frames are
+                flags[:, i] = np.searchsorted(fired, end, side='right') > np.searchsorted(fired, start)
+
+        return RepTable(
+            start_frame=start.astype(np.int32),
+            bottom_frame=bottom.astype(np.int32),
+            end_frame=end.astype(np.int32),
+            duration=np.array(rep_times, dtype=np.float32),
+            eccentric_sec=eccentric.astype(np.float32),
+            concentric_sec=concentric.astype(np.float32),
+            min_angle=np.array(min_angles, dtype=np.float32),
+            flags=flags,
+            flag_names=flag_names
+        )
@@ -0,0 +1,65 @@
+import os
+import time
+import tempfile
+
+class DiskLRU:
+    """
+    A directory of cache files with the same extension, each shared by every
+    process that opens the directory. Entries are written atomically, so
+    readers never see a partial file. Reads refresh an entry's mtime, and
+    evict() deletes entries by least recent use until the rest fit in
+    max_bytes. With max_age, it also deletes entries unused for that long.
+    Other files in the directory are left alone.
+    """
+    def __init__(self, cache_dir: str, suffix: str, max_bytes: int, max_age: float = None):
+        self.cache_dir = cache_dir
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def write(self, key: str, write, mode: str = 'wb'):
+        """Calls write(file) on a temp file, renames it over the entry, then evicts."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            self.remove(tmp_path)
+            raise
+        self.evict()
+
+    def touch(self, key: str):
+        """Marks an entry as recently used."""
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            pass # Evicted by another process since it was read; the caller's copy is still good
+
+    def remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.suffix): continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, name in sorted(entries):
+            # Oldest first: once one entry is within both limits, so is every later one
+            if total <= self.max_bytes and (self.max_age is None or now - mtime <= self.max_age): break
+            self.remove(os.path.join(self.cache_dir, name))
+            total -= size
@@ -1,111 +1,187 @@
-import mediapipe as mp
+import math
 import numpy as np
+from backend.ml.video_engine import landmarks as lm
 
 class ExerciseLogic:
-    """Base class defining the contract for an exercise's logic."""
-    def get_main_angle(self, landmarks, frame_shape):
-        """Must return the primary angle for rep counting."""
+    """
+    Base class defining the contract for an exercise's logic.
+    All methods take a (33, 4) landmark array in pixel space (see landmarks.py).
+    """
+    # Named joint angles as (point, vertex, point) landmark triples.
+    # MAIN_ANGLE names the entry used for rep counting.
+    ANGLES = {}
+    MAIN_ANGLE = None
+    # Main-angle hysteresis used to track whether the user is in the 'down' phase.
+    DOWN_THRESHOLD = 100
+    UP_THRESHOLD = 150
+    # Whether the main angle closes in the eccentric (lowering) phase, i.e. the
+    # peak -> trough half of a rep is eccentric; a pull-up closes it on the way up.
+    ANGLE_CLOSES_ECCENTRIC = True
+
+    _TRIPLES = np.zeros((0, 3), dtype=np.intp)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Index arrays for the batched path, built once per class rather than per call
+        cls._TRIPLES = np.array(list(cls.ANGLES.values()), dtype=np.intp).reshape(-1, 3)
+
+    def compute_angles(self, points: np.ndarray) -> dict:
+        """
+        Computes every angle in ANGLES: a (frames, 33, 4) tensor in one batched
+        vector operation, a single (33, 4) frame with scalar math, which is
+        several times faster than NumPy's per-call overhead for a handful of angles.
+        """
+        if points.ndim == 2: return self._frame_angles(points)
+        triples = self._TRIPLES
+        values = self._calculate_angle(
+            points[..., triples[:, 0], :2],
+            points[..., triples[:, 1], :2],
+            points[..., triples[:, 2], :2],
+        )
+        return {name: values[..., i] for i, name in enumerate(self.ANGLES)}
+
+    def _frame_angles(self, points: np.ndarray) -> dict:
+        xy = points[:, :2].tolist()
+        angles = {}
+        for name, (a, b, c) in self.ANGLES.items():
+            (ax, ay), (bx, by), (cx, cy) = xy[a], xy[b], xy[c]
+            v1x, v1y, v2x, v2y = ax - bx, ay - by, cx - bx, cy - by
+            norm_product = math.hypot(v1x, v1y) * math.hypot(v2x, v2y)
+            if not norm_product > 0: # Zero-length limb or missing landmark
+                angles[name] = math.nan
+                continue
+            cosine_angle = (v1x * v2x + v1y * v2y) / norm_product
+            angles[name] = math.degrees(math.acos(min(1.0, max(-1.0, cosine_angle))))
+        return angles
+
+    def get_main_angle(self, points: np.ndarray, angles: dict = None):
+        """Returns the primary angle for rep counting, or None if it is undefined."""
+        if angles is None: angles = self.compute_angles(points)
+        angle = angles[self.MAIN_ANGLE]
+        return None if np.isnan(angle) else float(angle)
+
+    def get_form_masks(self, points: np.ndarray, angles: dict, down) -> dict:
+        """
+        Must return a dict mapping each form feedback string to a boolean mask.
+        Inputs broadcast over leading dimensions, so the same rules evaluate a
+        single frame or a whole (frames, 33, 4) tensor. `down` is the rep-state mask.
+        """
         raise NotImplementedError
 
-    def get_form_feedback(self, landmarks, frame_shape, rep_state):
-        """Must return a set of form feedback strings."""
+    def get_posture_mask(self, points: np.ndarray) -> np.ndarray:
+        """
+        Must return a boolean mask of the frames whose body posture fits this
+        exercise; used to tell exercises apart in a multi-exercise session.
+        Broadcasts over leading dimensions like get_form_masks.
+        """
         raise NotImplementedError
 
+    def _torso_horizontal(self, points):
+        torso = points[..., lm.RIGHT_SHOULDER, :2] - points[..., lm.RIGHT_HIP, :2]
+        return np.abs(torso[..., lm.X]) > np.abs(torso[..., lm.Y])
+
+    def get_form_messages(self) -> list:
+        """Lists every feedback string get_form_masks can return, in a fixed order."""
+        empty = np.zeros((0, lm.NUM_LANDMARKS, 4), dtype=np.float32)
+        return list(self.get_form_masks(empty, self.compute_angles(empty), np.zeros(0, dtype=bool)))
+
+    def get_form_feedback(self, points: np.ndarray, rep_state: str, angles: dict = None):
+        """Returns the set of form feedback strings triggered by a single frame."""
+        if angles is None: angles = self.compute_angles(points)
+        masks = self.get_form_masks(points, angles, np.asarray(rep_state == 'down'))
+        return {message for message, mask in masks.items() if mask}
+
+    def get_down_mask(self, main_angles: np.ndarray) -> np.ndarray:
+        """
+        Vectorized rep-state tracking over a main-angle series. Applies the same
+        DOWN_THRESHOLD / UP_THRESHOLD hysteresis as the frame-by-frame toggle,
+        starting 'up'; NaN frames keep the previous state.
+        """
+        state = np.full(main_angles.shape, -1, dtype=np.int8)
+        state[main_angles < self.DOWN_THRESHOLD] = 1
+        state[main_angles > self.UP_THRESHOLD] = 0
+        last_change = np.where(state >= 0, np.arange(len(state)), -1)
+        np.maximum.accumulate(last_change, out=last_change)
+        return (last_change >= 0) & (state[last_change] == 1)
+
     def _calculate_angle(self, p1, p2, p3):
-        """Calculates a stable angle from three landmark points using vector math."""
-        p1, p2, p3 = np.array(p1), np.array(p2), np.array(p3)
-        v1 = p1 - p2
-        v2 = p3 - p2
-        dot_product = np.dot(v1, v2)
-        norm_product = np.linalg.norm(v1) * np.linalg.norm(v2)
-        if norm_product == 0: return None
+        """
+        Calculates stable angles at p2 using vector math. Inputs broadcast over
+        leading dimensions; degenerate angles (zero-length limb) are NaN.
+        """
+        v1 = np.asarray(p1, dtype=np.float64) - p2
+        v2 = np.asarray(p3, dtype=np.float64) - p2
+        dot_product = np.sum(v1 * v2, axis=-1)
+        norm_product = np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1)
         cosine_angle = dot_product / np.clip(norm_product, 1e-7, np.inf)
         angle = np.degrees(np.arccos(np.clip(cosine_angle, -1.0, 1.0)))
-        return angle
+        return np.where(norm_product == 0, np.nan, angle)
 
 class PushupLogic(ExerciseLogic):
     """Contains all specific logic for analyzing a push-up."""
-    def get_main_angle(self, landmarks, frame_shape):
-        h, w, _ = frame_shape
-        shoulder = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].y * h]
-        elbow = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_ELBOW.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_ELBOW.value].y * h]
-        wrist = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_WRIST.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_WRIST.value].y * h]
-        return self._calculate_angle(shoulder, elbow, wrist)
-
-    def get_form_feedback(self, landmarks, frame_shape, rep_state):
-        feedback = set()
-        h, w, _ = frame_shape
-
-        r_shoulder = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].y * h]
-        r_hip = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_HIP.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_HIP.value].y * h]
-        r_ankle = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_ANKLE.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_ANKLE.value].y * h]
-        r_ear = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_EAR.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_EAR.value].y * h]
-
-        body_angle = self._calculate_angle(r_shoulder, r_hip, r_ankle)
-        if body_angle is not None and body_angle < 155:
-            feedback.add("Form Issue: Keep your body straight to avoid sagging your hips.")
-
-        if rep_state == 'down':
-            elbow_angle = self.get_main_angle(landmarks, frame_shape)
-            if elbow_angle is not None and elbow_angle > 100:
-                feedback.add("Form Issue: Go lower for a full range of motion.")
-
-        head_angle = self._calculate_angle(r_ear, r_shoulder, r_hip)
-        if head_angle is not None and (head_angle < 150 or head_angle > 210):
-             feedback.add("Form Issue: Keep your neck aligned with your spine.")
-
-        return feedback
+    ANGLES = {
+        'elbow': (lm.RIGHT_SHOULDER, lm.RIGHT_ELBOW, lm.RIGHT_WRIST),
+        'body': (lm.RIGHT_SHOULDER, lm.RIGHT_HIP, lm.RIGHT_ANKLE),
+        'head': (lm.RIGHT_EAR, lm.RIGHT_SHOULDER, lm.RIGHT_HIP),
+    }
+    MAIN_ANGLE = 'elbow'
+    BODY_LINE_MIN = 155
+    DEPTH_MAX = 100
+    NECK_RANGE = (150, 210)
+
+    def get_form_masks(self, points, angles, down):
+        return {
+            "Form Issue: Keep your body straight to avoid sagging your hips.": angles['body'] < self.BODY_LINE_MIN,
+            "Form Issue: Go lower for a full range of motion.": down & (angles['elbow'] > self.DEPTH_MAX),
+            "Form Issue: Keep your neck aligned with your spine.": (angles['head'] < self.NECK_RANGE[0]) | (angles['head'] > self.NECK_RANGE[1]),
+        }
+
+    def get_posture_mask(self, points):
+        return self._torso_horizontal(points)
 
 class SquatLogic(ExerciseLogic):
     """Contains all specific logic for analyzing a squat."""
-    def get_main_angle(self, landmarks, frame_shape):
-        h, w, _ = frame_shape
-        hip = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_HIP.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_HIP.value].y * h]
-        knee = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_KNEE.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_KNEE.value].y * h]
-        ankle = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_ANKLE.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_ANKLE.value].y * h]
-        return self._calculate_angle(hip, knee, ankle)
-
-    def get_form_feedback(self, landmarks, frame_shape, rep_state):
-        feedback = set()
-        h, w, _ = frame_shape
-
-        r_hip = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_HIP.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_HIP.value].y * h]
-        r_knee = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_KNEE.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_KNEE.value].y * h]
-        r_toe = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_FOOT_INDEX.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_FOOT_INDEX.value].y * h]
-        r_shoulder = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].y * h]
-        
-        if rep_state == 'down':
-            if r_knee[0] > r_toe[0] + 15: # Add a small buffer
-                feedback.add("Form Issue: Avoid letting knees extend too far beyond your toes.")
-
-            back_angle = self._calculate_angle(r_shoulder, r_hip, r_knee)
-            if back_angle is not None and back_angle < 75:
-                feedback.add("Form Issue: Keep your chest up and back straight.")
-
-            if r_hip[1] < r_knee[1]:
-                feedback.add("Form Issue: Squat deeper for better effectiveness.")
-
-        return feedback
+    ANGLES = {
+        'knee': (lm.RIGHT_HIP, lm.RIGHT_KNEE, lm.RIGHT_ANKLE),
+        'back': (lm.RIGHT_SHOULDER, lm.RIGHT_HIP, lm.RIGHT_KNEE),
+    }
+    MAIN_ANGLE = 'knee'
+    KNEE_TOE_BUFFER = 15 # pixels
+    BACK_MIN = 75
+
+    def get_form_masks(self, points, angles, down):
+        r_hip, r_knee, r_toe = points[..., lm.RIGHT_HIP, :], points[..., lm.RIGHT_KNEE, :], points[..., lm.RIGHT_FOOT_INDEX, :]
+        return {
+            "Form Issue: Avoid letting knees extend too far beyond your toes.": down & (r_knee[..., lm.X] > r_toe[..., lm.X] + self.KNEE_TOE_BUFFER),
+            "Form Issue: Keep your chest up and back straight.": down & (angles['back'] < self.BACK_MIN),
+            "Form Issue: Squat deeper for better effectiveness.": down & (r_hip[..., lm.Y] < r_knee[..., lm.Y]),
+        }
+
+    def get_posture_mask(self, points):
+        # Upright, hands below the head (image y grows downwards)
+        return ~self._torso_horizontal(points) & (points[..., lm.RIGHT_WRIST, lm.Y] > points[..., lm.NOSE, lm.Y])
 
 class PullupLogic(ExerciseLogic):
     """Contains all specific logic for analyzing a pull-up."""
-    def get_main_angle(self, landmarks, frame_shape):
-        h, w, _ = frame_shape
-        shoulder = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].y * h]
-        elbow = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_ELBOW.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_ELBOW.value].y * h]
-        wrist = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_WRIST.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_WRIST.value].y * h]
-        return self._calculate_angle(shoulder, elbow, wrist)
-
-    def get_form_feedback(self, landmarks, frame_shape, rep_state):
-        feedback = set()
-        h, w, _ = frame_shape
-
-        r_ear = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_EAR.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_EAR.value].y * h]
-        r_shoulder = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].x * w, landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].y * h]
-
-        if rep_state == 'up':
-            # Check if the chin is above the shoulder level as a proxy for the bar
-            if r_ear[1] > r_shoulder[1]:
-                feedback.add("Form Issue: Pull higher to bring your chin over the bar.")
-        
-        return feedback
\ No newline at end of file
+    ANGLES = {
+        'elbow': (lm.RIGHT_SHOULDER, lm.RIGHT_ELBOW, lm.RIGHT_WRIST),
+    }
+    MAIN_ANGLE = 'elbow'
+    ANGLE_CLOSES_ECCENTRIC = False
+
+    def get_form_masks(self, points, angles, down):
+        # Chin above the shoulder level is used as a proxy for the bar
+        return {
+            "Form Issue: Pull higher to bring your chin over the bar.": ~down & (points[..., lm.RIGHT_EAR, lm.Y] > points[..., lm.RIGHT_SHOULDER, lm.Y]),
+        }
+
+    def get_posture_mask(self, points):
+        # Hanging upright with the hands above the head
+        return ~self._torso_horizontal(points) & (points[..., lm.RIGHT_WRIST, lm.Y] < points[..., lm.NOSE, lm.Y])
+
+# Every exercise the engine can analyse, by the name used in the API and CLI
+EXERCISE_LOGICS = {
+    'pushup': PushupLogic,
+    'squat': SquatLogic,
+    'pullup': PullupLogic
+}
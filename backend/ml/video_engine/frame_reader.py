@@ -0,0 +1,63 @@
+import queue
+import threading
+import cv2
+import numpy as np
+
+class ThreadedFrameReader:
+    """
+    Wraps a cv2.VideoCapture and decodes frames on a background thread, so
+    decoding overlaps pose inference on the caller's thread. Frames are decoded
+    into a ring of buffer_size preallocated arrays: the decoder blocks when every
+    slot is full, so memory stays flat however far ahead it gets.
+
+    read() and release() mirror cv2.VideoCapture. A frame returned by read()
+    is only valid until the next read() call, which hands its slot back.
+    Decoding stops after max_frames, or at the end of the stream by default.
+    """
+    def __init__(self, cap, max_frames: int = None, buffer_size: int = 4):
+        self.cap = cap
+        self.max_frames = max_frames
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._free = queue.Queue()
+        for _ in range(buffer_size):
+            self._free.put(np.empty((height, width, 3), dtype=np.uint8))
+        self._filled = queue.Queue()
+        self._current = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._decode, daemon=True)
+        self._thread.start()
+
+    def _decode(self):
+        try:
+            decoded = 0
+            while self.max_frames is None or decoded < self.max_frames:
+                slot = self._free.get()
+                if slot is None or self._stop.is_set(): return
+                # Decodes into the slot when its shape matches, otherwise OpenCV allocates
+                ret, frame = self.cap.read(slot)
+                if not ret: break
+                self._filled.put(frame)
+                decoded += 1
+        except Exception as e:
+            self._filled.put(e)
+            return
+        self._filled.put(None) # End of stream
+
+    def read(self):
+        if self._current is not None:
+            self._free.put(self._current)
+            self._current = None
+        item = self._filled.get()
+        if isinstance(item, Exception): raise item
+        if item is None:
+            self._filled.put(None) # Keep reporting end of stream
+            return False, None
+        self._current = item
+        return True, item
+
+    def release(self):
+        self._stop.set()
+        self._free.put(None) # Wake the decoder if it is waiting for a slot
+        self._thread.join()
+        self.cap.release()
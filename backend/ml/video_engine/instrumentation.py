@@ -0,0 +1,78 @@
+import sys
+import json
+import bisect
+import logging
+import time
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Upper edges (ms) of the per-call latency histogram buckets; the last bucket is open
+HISTOGRAM_EDGES_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported."""
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class StageTimings:
+    """
+    Cumulative wall time and a latency histogram per pipeline stage.
+
+    The hot path brackets a stage with start()/record():
+
+        t = timings.start()
+        ret, frame = cap.read()
+        t = timings.record('decode', t)
+
+    record() returns the current time so consecutive stages chain without
+    extra clock reads. A disabled instance never reads the clock and stores
+    nothing, so instrumented code costs a couple of method calls per stage.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._stages = {}
+
+    def start(self) -> float:
+        return time.perf_counter() if self.enabled else 0.0
+
+    def record(self, stage: str, start: float) -> float:
+        if not self.enabled: return 0.0
+        now = time.perf_counter()
+        elapsed = now - start
+        entry = self._stages.get(stage)
+        if entry is None:
+            entry = self._stages[stage] = [0, 0.0, 0.0, [0] * (len(HISTOGRAM_EDGES_MS) + 1)]
+        entry[0] += 1
+        entry[1] += elapsed
+        if elapsed > entry[2]: entry[2] = elapsed
+        entry[3][bisect.bisect_left(HISTOGRAM_EDGES_MS, elapsed * 1000)] += 1
+        return now
+
+    def summary(self) -> dict:
+        """JSON-ready block: per-stage count, total, mean, max and histogram, plus peak RSS."""
+        stages = {}
+        for stage, (count, total, longest, buckets) in self._stages.items():
+            labels = [f"<={edge}" for edge in HISTOGRAM_EDGES_MS] + [f">{HISTOGRAM_EDGES_MS[-1]}"]
+            stages[stage] = dict(
+                count=count,
+                total_sec=round(total, 4),
+                mean_ms=round(total / count * 1000, 3),
+                max_ms=round(longest * 1000, 3),
+                histogram_ms={label: n for label, n in zip(labels, buckets) if n}
+            )
+        return dict(stages=stages, peak_rss_mb=peak_rss_mb())
+
+    def log(self, **context):
+        """Emits one structured (JSON) log record per stage, tagged with context."""
+        if not self.enabled: return
+        summary = self.summary()
+        for stage, stats in summary['stages'].items():
+            logger.info(json.dumps(dict(context, event='stage_timing', stage=stage, **stats)))
+        logger.info(json.dumps(dict(context, event='peak_rss', peak_rss_mb=summary['peak_rss_mb'])))
@@ -0,0 +1,41 @@
+import json
+import hashlib
+import numpy as np
+from backend.ml.video_engine.disk_lru import DiskLRU
+
+class LandmarkCache:
+    """
+    Content-addressed on-disk cache of pass-1 landmark tensors.
+
+    Entries are compressed .npz files keyed by a hash of the video bytes plus
+    the pose/extraction config, so re-analysing the same clip (under another
+    exercise type or with retuned thresholds) skips decode and inference.
+    Reads refresh an entry's mtime and writes evict least-recently-used
+    entries until the directory fits in max_bytes (see DiskLRU).
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._disk = DiskLRU(cache_dir, '.npz', max_bytes)
+
+    def key(self, video_path: str, config: dict) -> str:
+        digest = hashlib.sha256()
+        with open(video_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.update(json.dumps(config, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def load(self, key: str):
+        """Returns (landmarks, fps, total_frames, frame_indices) or None on a miss."""
+        try:
+            with np.load(self._disk.path(key)) as data:
+                entry = (data['landmarks'], float(data['fps']), int(data['total_frames']), data['frame_indices'])
+        except (OSError, KeyError, ValueError):
+            return None
+        self._disk.touch(key)
+        return entry
+
+    def store(self, key: str, landmarks: np.ndarray, fps: float, total_frames: int, frame_indices: np.ndarray):
+        self._disk.write(key, lambda f: np.savez_compressed(f, landmarks=landmarks, fps=fps, total_frames=total_frames,
+                                                            frame_indices=frame_indices))
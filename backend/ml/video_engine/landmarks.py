@@ -0,0 +1,112 @@
+import os
+import zipfile
+import numpy as np
+
+# MediaPipe Pose topology: 33 landmarks, indices match mp.solutions.pose.PoseLandmark.
+NUM_LANDMARKS = 33
+NOSE = 0
+LEFT_EAR, RIGHT_EAR = 7, 8
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+LEFT_FOOT_INDEX, RIGHT_FOOT_INDEX = 31, 32
+
+# Column layout of a landmark array.
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+
+
+def landmarks_to_array(landmarks, frame_shape, origin=(0, 0)) -> np.ndarray:
+    """
+    Converts a MediaPipe landmark list into a (33, 4) float32 array of
+    (x, y, z, visibility) in pixel space. z is scaled by the frame width,
+    matching MediaPipe's convention that z shares the scale of x.
+    When inference ran on a crop, frame_shape is the crop's size and origin its
+    top-left corner, so the result is in full-frame coordinates.
+    """
+    points = np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float32)
+    return scale_landmarks(points, frame_shape, origin)
+
+
+def scale_landmarks(points: np.ndarray, frame_shape, origin=(0, 0)) -> np.ndarray:
+    """
+    Converts normalized (..., 33, 4) landmark arrays, as produced by MediaPipe
+    on a client, to pixel space in place (see landmarks_to_array) and returns them.
+    """
+    h, w = frame_shape[:2]
+    points[..., X] = points[..., X] * w + origin[0]
+    points[..., Y] = points[..., Y] * h + origin[1]
+    points[..., Z] *= w
+    return points
+
+
+def _npy_header(archive: zipfile.ZipFile, name: str):
+    """(shape, dtype) of an array in an .npz, read from its .npy header without decompressing the data."""
+    with archive.open(f"{name}.npy") as f:
+        version = np.lib.format.read_magic(f)
+        read_header = {(1, 0): np.lib.format.read_array_header_1_0,
+                       (2, 0): np.lib.format.read_array_header_2_0}.get(version)
+        if read_header is None: raise ValueError(f"Unsupported .npy version for {name}: {version}")
+        shape, _, dtype = read_header(f)
+    return shape, dtype
+
+
+def _check_shape(shape, dtype, max_frames: int = None):
+    if len(shape) != 3 or shape[1:] != (NUM_LANDMARKS, 4):
+        raise ValueError(f"landmarks must have shape (frames, {NUM_LANDMARKS}, 4), got {shape}")
+    if dtype.kind != 'f': raise ValueError("landmarks must be floating point")
+    if shape[0] == 0: raise ValueError("landmarks contain no frames")
+    if max_frames and shape[0] > max_frames: raise ValueError(f"landmarks exceed {max_frames} frames")
+
+
+def load_landmark_upload(path: str, frame_shape, max_frames: int = None):
+    """
+    Parses landmarks computed on a client into a pixel-space (frames, 33, 4)
+    float32 tensor. The file at path is either an .npz with a `landmarks`
+    array (and an optional increasing `frame_indices` array when the client
+    sampled frames) or raw little-endian float32 values, frames x 33 x
+    [x, y, z, visibility], normalized as MediaPipe outputs them. Frames
+    without a pose are all-NaN. Shapes and dtypes are checked from the .npy
+    headers before anything is decompressed, so a small archive can't expand
+    into a huge array. Returns (landmarks, frame_indices or None); raises
+    ValueError on a malformed payload.
+    """
+    frame_indices = None
+    if zipfile.is_zipfile(path):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                names = set(archive.namelist())
+                if 'landmarks.npy' not in names: raise ValueError("Landmark archive has no `landmarks` array")
+                _check_shape(*_npy_header(archive, 'landmarks'), max_frames)
+                if 'frame_indices.npy' in names:
+                    shape, dtype = _npy_header(archive, 'frame_indices')
+                    if len(shape) != 1 or dtype.kind not in 'iu':
+                        raise ValueError("frame_indices must be one integer per landmark frame")
+            with np.load(path, allow_pickle=False) as npz:
+                points = npz['landmarks']
+                if 'frame_indices' in npz: frame_indices = npz['frame_indices']
+        except (KeyError, OSError, EOFError, zipfile.BadZipFile) as e:
+            raise ValueError(f"Invalid landmark archive: {e}")
+    else:
+        if os.path.getsize(path) % (NUM_LANDMARKS * 4 * 4): raise ValueError(f"Raw landmark data must be float32 frames x {NUM_LANDMARKS} x 4")
+        _check_shape((os.path.getsize(path) // (NUM_LANDMARKS * 4 * 4), NUM_LANDMARKS, 4), np.dtype('<f4'), max_frames)
+        points = np.fromfile(path, dtype='<f4').reshape(-1, NUM_LANDMARKS, 4)
+
+    _check_shape(points.shape, points.dtype, max_frames)
+    points = points.astype(np.float32, copy=False)
+
+    if np.isinf(points).any(): raise ValueError("landmarks contain infinite values")
+    known = ~np.isnan(points[..., VISIBILITY])
+    if (points[..., VISIBILITY][known] < 0).any() or (points[..., VISIBILITY][known] > 1).any():
+        raise ValueError("visibility must be between 0 and 1")
+
+    if frame_indices is not None:
+        if frame_indices.shape != (len(points),) or frame_indices.dtype.kind not in 'iu':
+            raise ValueError("frame_indices must be one integer per landmark frame")
+        frame_indices = frame_indices.astype(np.int64)
+        if frame_indices[0] < 0 or (np.diff(frame_indices) <= 0).any():
+            raise ValueError("frame_indices must be non-negative and strictly increasing")
+        if max_frames and frame_indices[-1] >= max_frames: raise ValueError(f"frame_indices exceed {max_frames} frames")
+    return scale_landmarks(points, frame_shape), frame_indices
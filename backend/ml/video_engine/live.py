@@ -0,0 +1,80 @@
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional
+import cv2
+import numpy as np
+from backend.ml.video_engine.exercise_logic import ExerciseLogic
+from backend.ml.video_engine.landmarks import landmarks_to_array
+from backend.ml.video_engine.pose_pool import PosePool, get_pose_pool, pose_config
+from backend.ml.video_engine.rep_detector import RepDetector, RepEvent
+
+@dataclass
+class LiveState:
+    """What a live client shows after each processed frame."""
+    rep_count: int
+    angle: Optional[float]
+    warnings: List[str] = field(default_factory=list)
+    rep: Optional[RepEvent] = None # Set on the frame that completed a rep
+
+class LiveSession:
+    """
+    Incremental analysis of one athlete's live stream. Frames (or landmark
+    arrays computed elsewhere) are fed one at a time with their capture
+    timestamp in seconds; timestamps rather than a frame counter drive the
+    RepDetector, so dropped frames don't distort rep timing. A form warning
+    stays active for warning_hold seconds after it last fired, which keeps an
+    overlay from flickering. Methods are serialised, so a session can be
+    closed from another thread while a frame is still being processed.
+    The first frame raises TimeoutError if the pool has no Pose free within
+    pose_timeout seconds (default: wait for one).
+    """
+    def __init__(self, logic: ExerciseLogic, fps: float = 30.0, warning_hold: float = 1.5,
+                 model_complexity='lite', pose_pool: PosePool = None, pose_timeout: float = None):
+        self.logic = logic
+        self.fps = fps
+        self.warning_hold = warning_hold
+        self.rep_detector = RepDetector(fps)
+        self.rep_state = 'up'
+        self.pose_config = pose_config(model_complexity)
+        self.pose_pool = pose_pool or get_pose_pool()
+        self.pose_timeout = pose_timeout
+        self._pose_checkout = None
+        self._pose = None
+        self._last_warned = {}
+        self._lock = threading.RLock()
+
+    def process_frame(self, frame: np.ndarray, timestamp: float) -> LiveState:
+        """Runs pose estimation on a BGR frame and updates the session."""
+        with self._lock:
+            if self._pose is None:
+                # Tracking state lives in the Pose graph, so the session keeps one for its lifetime
+                checkout = self.pose_pool.acquire(timeout=self.pose_timeout, **self.pose_config)
+                self._pose = checkout.__enter__()
+                self._pose_checkout = checkout
+            results = self._pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            points = landmarks_to_array(results.pose_landmarks.landmark, frame.shape) if results.pose_landmarks else None
+            return self.update_landmarks(points, timestamp)
+
+    def update_landmarks(self, points: Optional[np.ndarray], timestamp: float) -> LiveState:
+        """Updates the session with a (33, 4) pixel-space landmark array, or None if no pose was found."""
+        with self._lock:
+            angle = None
+            if points is not None:
+                angles = self.logic.compute_angles(points)
+                angle = self.logic.get_main_angle(points, angles)
+                if angle is not None:
+                    if angle < self.logic.DOWN_THRESHOLD: self.rep_state = 'down'
+                    if angle > self.logic.UP_THRESHOLD: self.rep_state = 'up'
+                for message in self.logic.get_form_feedback(points, self.rep_state, angles):
+                    self._last_warned[message] = timestamp
+
+            rep = self.rep_detector.update(angle, int(round(timestamp * self.fps)))
+            warnings = sorted(message for message, last in self._last_warned.items() if timestamp - last <= self.warning_hold)
+            return LiveState(self.rep_detector.count, angle, warnings, rep)
+
+    def close(self):
+        """Returns the Pose instance to the pool."""
+        with self._lock:
+            if self._pose_checkout is not None:
+                self._pose_checkout.__exit__(None, None, None)
+                self._pose_checkout, self._pose = None, None
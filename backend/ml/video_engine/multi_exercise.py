@@ -0,0 +1,104 @@
+import numpy as np
+from backend.ml.video_engine.analysis_engine import ExerciseAnalyzer
+from backend.ml.video_engine.exercise_logic import EXERCISE_LOGICS
+from backend.ml.video_engine.instrumentation import StageTimings
+from backend.ml.video_engine.landmark_cache import LandmarkCache
+from backend.ml.video_engine.reporting import ExerciseSegment
+from backend.ml.video_engine.segmented import extract_video_segments
+
+def classify_frames(landmarks: np.ndarray, logics: list) -> np.ndarray:
+    """
+    Labels every row of a (frames, 33, 4) tensor with the index of the first
+    logic whose posture mask matches, or -1 (no match or no pose).
+    """
+    matches = np.stack([logic.get_posture_mask(landmarks) for logic in logics], axis=1)
+    return np.where(matches.any(axis=1), matches.argmax(axis=1), -1)
+
+def _smooth_labels(labels: np.ndarray, classes: int, window: int) -> np.ndarray:
+    """Majority vote over a centred window; rows without any vote stay -1."""
+    votes = np.zeros((len(labels) + 1, classes), dtype=np.int64)
+    np.cumsum(labels[:, None] == np.arange(classes), axis=0, out=votes[1:])
+    rows = np.arange(len(labels))
+    low = np.clip(rows - window // 2, 0, len(labels))
+    high = np.clip(rows + window // 2 + 1, 0, len(labels))
+    counts = votes[high] - votes[low]
+    return np.where(counts.max(axis=1) > 0, counts.argmax(axis=1), -1)
+
+def _runs(labels: np.ndarray):
+    change = np.flatnonzero(np.diff(labels)) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [len(labels)]))
+    return [[label, start, end] for label, start, end in zip(labels[starts].tolist(), starts.tolist(), ends.tolist())]
+
+def detect_segments(labels: np.ndarray, classes: int, rows_per_second: float, min_segment_seconds: float = 3.0,
+                    smooth_seconds: float = 1.0):
+    """
+    Turns per-row exercise labels into (label, start_row, end_row) bouts:
+    labels are smoothed by a majority vote, bouts shorter than
+    min_segment_seconds are dropped, and a short gap between two bouts of the
+    same exercise (a pose dropout, a pause) is absorbed into them.
+    """
+    if len(labels) == 0: return []
+    labels = _smooth_labels(labels, classes, max(1, int(smooth_seconds * rows_per_second)))
+    min_rows = min_segment_seconds * rows_per_second
+
+    runs = _runs(labels)
+    for run in runs:
+        if run[2] - run[1] < min_rows: run[0] = -1
+    for before, run, after in zip(runs, runs[1:], runs[2:]):
+        if run[0] == -1 and before[0] == after[0] != -1 and run[2] - run[1] < min_rows: run[0] = before[0]
+
+    segments = []
+    for label, start, end in runs:
+        if segments and segments[-1][0] == label: segments[-1][2] = end
+        else: segments.append([label, start, end])
+    return [tuple(segment) for segment in segments if segment[0] >= 0]
+
+def analyze_exercises(landmarks: np.ndarray, fps: float, frame_indices: np.ndarray = None, min_segment_seconds: float = 3.0, **analyzer_kwargs):
+    """
+    Scores one landmark tensor against every registered exercise: each row is
+    classified by posture, rows are grouped into exercise bouts, and each bout
+    is evaluated by its own logic. Returns a list of ExerciseSegment, in time order.
+    """
+    if frame_indices is None: frame_indices = np.arange(len(landmarks))
+    if len(landmarks) == 0: return []
+
+    names = list(EXERCISE_LOGICS)
+    logics = [EXERCISE_LOGICS[name]() for name in names]
+    rows_per_second = fps * len(frame_indices) / (frame_indices[-1] + 1)
+    labels = classify_frames(landmarks, logics)
+
+    segments = []
+    for label, start, end in detect_segments(labels, len(logics), rows_per_second, min_segment_seconds):
+        first_frame = int(frame_indices[start])
+        end_frame = int(frame_indices[end]) if end < len(frame_indices) else int(frame_indices[-1]) + 1
+        analyzer = ExerciseAnalyzer(exercise_logic=logics[label], batch_rules=True, **analyzer_kwargs)
+        report = analyzer.evaluate_landmarks(landmarks[start:end], fps, end_frame - first_frame, frame_indices[start:end] - first_frame)
+        report.reps.offset_frames(first_frame)
+        segments.append(ExerciseSegment(names[label], round(first_frame / fps, 2), round(end_frame / fps, 2), report))
+    return segments
+
+def analyze_video_exercises(video_path: str, workers: int = 1, landmark_cache: LandmarkCache = None,
+                            timings: StageTimings = None, min_segment_seconds: float = 3.0, on_progress=None,
+                            **analyzer_kwargs):
+    """
+    Single-pass analysis of a session that may contain several exercises (e.g.
+    a circuit of squats then push-ups): landmarks are extracted once, then
+    every registered logic is applied to them (see analyze_exercises).
+    Adaptive sampling follows one exercise's main angle, so frame_stride must be 1.
+    on_progress (if given) is called with the fraction of the video extracted.
+    """
+    if analyzer_kwargs.get('frame_stride', 1) > 1:
+        raise ValueError("Multi-exercise analysis requires frame_stride=1.")
+
+    # Extraction at stride 1 does not depend on the logic
+    logic = next(iter(EXERCISE_LOGICS.values()))()
+    if workers > 1:
+        landmarks, fps, _, frame_indices = extract_video_segments(video_path, logic, workers, timings=timings,
+                                                                  on_progress=on_progress, landmark_cache=landmark_cache,
+                                                                  **analyzer_kwargs)
+    else:
+        analyzer = ExerciseAnalyzer(exercise_logic=logic, batch_rules=True, landmark_cache=landmark_cache, timings=timings,
+                                    on_progress=on_progress, **analyzer_kwargs)
+        landmarks, fps, _, frame_indices = analyzer.load_landmarks(video_path)
+    return analyze_exercises(landmarks, fps, frame_indices, min_segment_seconds, timings=timings, **analyzer_kwargs)
@@ -0,0 +1,125 @@
+import math
+import itertools
+import cv2
+import numpy as np
+import mediapipe as mp
+from mediapipe.tasks.python import BaseOptions, vision
+from scipy.optimize import linear_sum_assignment
+from backend.ml.video_engine.analysis_engine import ExerciseAnalyzer
+from backend.ml.video_engine.exercise_logic import ExerciseLogic
+from backend.ml.video_engine import landmarks as lm
+from backend.ml.video_engine.landmarks import NUM_LANDMARKS, landmarks_to_array
+from backend.ml.video_engine.preprocessing import FramePreprocessor
+from backend.ml.video_engine.reporting import PersonReport
+
+TORSO = [lm.LEFT_SHOULDER, lm.RIGHT_SHOULDER, lm.LEFT_HIP, lm.RIGHT_HIP]
+
+class CentroidTracker:
+    """
+    Keeps person identities across frames. Each detection is reduced to its
+    torso centroid and matched one-to-one to the live tracks' last centroids
+    (Hungarian assignment on pixel distance, gated by max_distance);
+    unmatched detections start new tracks, and tracks unseen for more than
+    max_missed frames are retired.
+    """
+    def __init__(self, max_distance: float, max_missed: int):
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.tracks = {} # track id -> [last centroid, frames missed]
+        self._next_id = 0
+
+    def _centroid(self, points: np.ndarray) -> np.ndarray:
+        torso = points[TORSO, :2]
+        if np.isnan(torso).all(): torso = points[:, :2]
+        return np.nanmean(torso, axis=0)
+
+    def update(self, detections: list) -> list:
+        """Returns the track id of every detection (a (33, 4) array) of the current frame."""
+        centroids = np.array([self._centroid(points) for points in detections]).reshape(-1, 2)
+        live = list(self.tracks)
+        ids = [None] * len(detections)
+        if live and detections:
+            last = np.array([self.tracks[track][0] for track in live])
+            cost = np.linalg.norm(last[:, None] - centroids[None], axis=-1)
+            for row, col in zip(*linear_sum_assignment(cost)):
+                if cost[row, col] <= self.max_distance: ids[col] = live[row]
+
+        for col, track in enumerate(ids):
+            if track is None:
+                track = ids[col] = self._next_id
+                self._next_id += 1
+            self.tracks[track] = [centroids[col], 0]
+
+        for track in set(live) - set(ids):
+            self.tracks[track][1] += 1
+            if self.tracks[track][1] > self.max_missed: del self.tracks[track]
+        return ids
+
+def analyze_group_video(video_path: str, logic: ExerciseLogic, model_path: str, max_people: int = 8,
+                        max_inference_size: int = None, min_track_seconds: float = 2.0, on_progress=None, **analyzer_kwargs):
+    """
+    Analyses a video of several athletes doing the same exercise in one decode:
+    a multi-pose MediaPipe PoseLandmarker (model_path is its .task file) finds
+    up to max_people per frame, a CentroidTracker links them into tracks, and
+    every track gets its own landmark tensor, angle series and rep analysis.
+    Tracks visible for less than min_track_seconds are ignored. Returns one
+    PersonReport per athlete, numbered in order of first appearance.
+    on_progress (if given) is called with the fraction of frames processed.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened(): raise IOError(f"Could not open video file: {video_path}")
+
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps == 0: fps = 30 # Default FPS if not available
+    diagonal = math.hypot(cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    options = vision.PoseLandmarkerOptions(
+        base_options=BaseOptions(model_asset_path=model_path),
+        running_mode=vision.RunningMode.VIDEO,
+        num_poses=max_people
+    )
+    # An athlete may move a tenth of the frame diagonal while briefly undetected
+    tracker = CentroidTracker(max_distance=0.1 * diagonal, max_missed=int(fps))
+    preprocessor = FramePreprocessor(max_inference_size)
+    tracks = {} # track id -> ([frame indices], [landmark arrays])
+
+    print("Starting Pass 1: Multi-Person Landmark Extraction...")
+    try:
+        with vision.PoseLandmarker.create_from_options(options) as landmarker:
+            # The container's frame count is only an estimate: read until the stream ends
+            for frame_idx in itertools.count():
+                ret, frame = cap.read()
+                if not ret: break
+
+                image, (x0, y0, crop_w, crop_h) = preprocessor.prepare(frame)
+                results = landmarker.detect_for_video(
+                    mp.Image(image_format=mp.ImageFormat.SRGB, data=image), int(frame_idx * 1000 / fps))
+                detections = [landmarks_to_array(pose, (crop_h, crop_w), (x0, y0)) for pose in results.pose_landmarks]
+                for track, points in zip(tracker.update(detections), detections):
+                    frames, samples = tracks.setdefault(track, ([], []))
+                    frames.append(frame_idx)
+                    samples.append(points)
+
+                if (frame_idx + 1) % 30 == 0:
+                    progress = min(1.0, (frame_idx + 1) / max(1, total_frames))
+                    print(f"Progress: {progress * 100:.2f}% ({len(tracker.tracks)} people tracked)", end='\r')
+                    if on_progress: on_progress(progress)
+    finally:
+        cap.release()
+    print("\nPass 1 Complete.")
+
+    people = []
+    for track in sorted(tracks):
+        frames, samples = np.array(tracks[track][0]), tracks[track][1]
+        span = frames[-1] - frames[0] + 1
+        if span / fps < min_track_seconds: continue
+
+        # Frames where the track was not detected stay NaN, like a missing pose
+        landmarks = np.full((span, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        landmarks[frames - frames[0]] = samples
+        analyzer = ExerciseAnalyzer(exercise_logic=logic, batch_rules=True, **analyzer_kwargs)
+        report = analyzer.evaluate_landmarks(landmarks, fps)
+        report.reps.offset_frames(frames[0])
+        people.append(PersonReport(len(people) + 1, round(frames[0] / fps, 2), round((frames[-1] + 1) / fps, 2), report))
+    return people
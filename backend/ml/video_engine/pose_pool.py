@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+import multiprocessing
+from contextlib import contextmanager
+import numpy as np
+import mediapipe as mp
+
+# Accuracy/throughput trade-off of the MediaPipe pose landmark model
+MODEL_COMPLEXITY = {'lite': 0, 'full': 1, 'heavy': 2}
+
+def pose_config(model_complexity='full', smooth_landmarks: bool = True,
+                min_detection_confidence: float = 0.5, min_tracking_confidence: float = 0.5) -> dict:
+    """Normalises Pose keyword arguments; model_complexity may be a name or 0-2."""
+    if isinstance(model_complexity, str):
+        if model_complexity not in MODEL_COMPLEXITY:
+            raise ValueError(f"Unknown model complexity: {model_complexity}")
+        model_complexity = MODEL_COMPLEXITY[model_complexity]
+    return dict(
+        model_complexity=model_complexity,
+        smooth_landmarks=smooth_landmarks,
+        min_detection_confidence=min_detection_confidence,
+        min_tracking_confidence=min_tracking_confidence,
+    )
+
+class PosePool:
+    """
+    Thread-safe pool of pre-warmed MediaPipe Pose estimators, one free list per
+    config. acquire() hands out an idle estimator or builds a new one while fewer
+    than max_per_config exist, and otherwise blocks until one is returned, which
+    also bounds how many analyses run inference at once. With a timeout,
+    acquire() gives up with TimeoutError instead (0 doesn't wait at all).
+    Returned estimators are reset so no tracking state leaks from one video
+    into the next.
+    """
+    def __init__(self, max_per_config: int = None):
+        self.max_per_config = max_per_config or os.cpu_count() or 1
+        self._condition = threading.Condition()
+        self._idle = {}
+        self._created = {}
+
+    def _create(self, config: dict):
+        pose = mp.solutions.pose.Pose(**config)
+        # The first process() call loads the model and starts the graph
+        pose.process(np.zeros((64, 64, 3), dtype=np.uint8))
+        return pose
+
+    def _checkout(self, key, timeout: float = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._idle.get(key):
+                    return self._idle[key].pop()
+                if self._created.get(key, 0) < self.max_per_config:
+                    self._created[key] = self._created.get(key, 0) + 1
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No pose estimator became free in time")
+                self._condition.wait(remaining)
+
+    def _checkin(self, key, pose):
+        with self._condition:
+            if pose is None:
+                self._created[key] -= 1
+            else:
+                self._idle.setdefault(key, []).append(pose)
+            self._condition.notify()
+
+    @contextmanager
+    def acquire(self, timeout: float = None, **config):
+        key = tuple(sorted(config.items()))
+        pose = self._checkout(key, timeout)
+        try:
+            if pose is None: pose = self._create(config)
+        except BaseException:
+            self._checkin(key, None)
+            raise
+        try:
+            yield pose
+        except BaseException:
+            # Don't hand a graph that failed mid-run to the next caller
+            pose.close()
+            self._checkin(key, None)
+            raise
+        pose.reset()
+        self._checkin(key, pose)
+
+    def warm(self, count: int = 1, **config):
+        """Builds estimators for config until `count` are idle (within max_per_config)."""
+        key = tuple(sorted(config.items()))
+        with self._condition:
+            missing = min(count - len(self._idle.get(key, [])), self.max_per_config - self._created.get(key, 0))
+            if missing <= 0: return
+            self._created[key] = self._created.get(key, 0) + missing
+        for built in range(missing):
+            try:
+                pose = self._create(config)
+            except BaseException:
+                for _ in range(missing - built): self._checkin(key, None)
+                raise
+            self._checkin(key, pose)
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_pose_pool() -> PosePool:
+    """Returns the process-wide PosePool."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = PosePool()
+        return _default_pool
+
+def spawn_context():
+    """
+    Multiprocessing context for processes that run pose inference. MediaPipe
+    graphs do not survive fork(), so every worker starts a fresh interpreter.
+    """
+    return multiprocessing.get_context('spawn')
@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+from backend.ml.video_engine import landmarks as lm
+
+class FramePreprocessor:
+    """
+    Prepares decoded BGR frames for pose inference.
+
+    max_size caps the longest side of the image handed to the pose model.
+    roi_padding enables person-ROI cropping: the frame is cropped to the previous
+    frame's landmark bounding box, padded by this fraction of its larger side.
+    Cropping happens before the resize and the BGR->RGB conversion, so both only
+    touch the ROI's pixels. The crop is kept while the person stays inside it, so
+    the pose model's own tracking sees a stable image, and it falls back to the
+    full frame as soon as no pose is found.
+    """
+    def __init__(self, max_size: int = None, roi_padding: float = None, min_visibility: float = 0.5):
+        self.max_size = max_size
+        self.roi_padding = roi_padding
+        self.min_visibility = min_visibility
+        self._roi = None # (x0, y0, x1, y1) in full-frame pixels
+
+    def prepare(self, frame: np.ndarray):
+        """Returns the RGB image for inference and its crop box (x0, y0, w, h) in the full frame."""
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = self._roi if self._roi is not None else (0, 0, w, h)
+        image = frame[y0:y1, x0:x1]
+
+        if self.max_size and max(image.shape[:2]) > self.max_size:
+            scale = self.max_size / max(image.shape[:2])
+            size = (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB), (x0, y0, x1 - x0, y1 - y0)
+
+    def update(self, points: np.ndarray, frame_shape):
+        """Updates the ROI from this frame's full-frame landmarks (None when no pose was found)."""
+        if self.roi_padding is None: return
+        visible = points[points[:, lm.VISIBILITY] > self.min_visibility] if points is not None else None
+        if visible is None or len(visible) < 2:
+            self._roi = None
+            return
+
+        h, w = frame_shape[:2]
+        bx0, by0 = visible[:, lm.X].min(), visible[:, lm.Y].min()
+        bx1, by1 = visible[:, lm.X].max(), visible[:, lm.Y].max()
+        pad = self.roi_padding * max(bx1 - bx0, by1 - by0)
+        roi = (
+            int(max(0, bx0 - pad)), int(max(0, by0 - pad)),
+            int(min(w, np.ceil(bx1 + pad))), int(min(h, np.ceil(by1 + pad))),
+        )
+        if roi[2] <= roi[0] or roi[3] <= roi[1]:
+            self._roi = None
+            return
+
+        if self._roi is not None:
+            cx0, cy0, cx1, cy1 = self._roi
+            inside = cx0 <= bx0 and cy0 <= by0 and bx1 <= cx1 and by1 <= cy1
+            # Keep the current crop unless the person left it or shrank well inside it
+            if inside and (cx1 - cx0) * (cy1 - cy0) <= 2 * (roi[2] - roi[0]) * (roi[3] - roi[1]):
+                return
+        self._roi = roi
@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+
+@dataclass
+class RepEvent:
+    """A completed repetition, peak -> trough -> peak of the main angle."""
+    start_frame: int
+    bottom_frame: int
+    end_frame: int
+    min_angle: float
+    duration: float
+
+class RepDetector:
+    """
+    Streaming counterpart of ExerciseAnalyzer._analyze_reps.
+
+    Consumes one main angle at a time and tracks turning points with a
+    prominence threshold: a trough is confirmed once the angle has risen
+    `prominence` degrees above the running minimum, a peak once it has fallen
+    `prominence` below the running maximum. A rep completes when the peak after
+    a trough is confirmed and is kept if its duration is within
+    (min_duration, max_duration), matching the batch filter. As with
+    find_peaks, a peak needs a prominence-sized rise before it, so the first
+    trough only counts once the stream has climbed into a peak. Like the batch
+    `distance`, a trough closer than min_spacing seconds to the previous one
+    doesn't start a rep of its own. Missing angles (None or NaN) are skipped,
+    so a pose dropout in the middle of a rep can't turn into a peak. Memory use
+    is constant.
+    """
+    def __init__(self, fps: float, prominence: float = 30.0, min_duration: float = 0.4, max_duration: float = 5.0,
+                 min_spacing: float = 0.5):
+        self.fps = fps
+        self.prominence = prominence
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.min_spacing = min_spacing
+        self.count = 0
+        self._frame = -1
+        self._direction = 0 # -1 falling towards a trough, +1 rising towards a peak
+        self._extreme, self._extreme_frame = None, None
+        self._peak_frame = None # last confirmed peak, i.e. the start of the current rep
+        self._trough = None # (frame, angle) of the confirmed trough of the current rep
+        self._last_trough_frame = None
+
+    def update(self, angle, frame_idx: int = None):
+        """Feeds the angle at frame_idx (default: the next frame). Returns a RepEvent when a rep completes."""
+        self._frame = self._frame + 1 if frame_idx is None else frame_idx
+        if angle is None or angle != angle: return None
+
+        if self._direction == 0:
+            # Until the first turning point, the lowest angle so far is the left base
+            if self._extreme is None or angle <= self._extreme:
+                self._extreme, self._extreme_frame = angle, self._frame
+            elif angle - self._extreme >= self.prominence:
+                self._direction = 1
+                self._extreme, self._extreme_frame = angle, self._frame
+            return None
+
+        if (angle - self._extreme) * self._direction > 0:
+            self._extreme, self._extreme_frame = angle, self._frame
+            return None
+
+        if abs(angle - self._extreme) < self.prominence:
+            return None
+
+        turning_frame, turning_angle = self._extreme_frame, self._extreme
+        self._direction = -self._direction
+        self._extreme, self._extreme_frame = angle, self._frame
+        if self._direction == 1:
+            # Confirmed a trough
+            last_trough, self._last_trough_frame = self._last_trough_frame, turning_frame
+            if last_trough is not None and turning_frame - last_trough < self.min_spacing * self.fps:
+                self._last_trough_frame = last_trough
+                return None
+            if self._peak_frame is not None: self._trough = (turning_frame, turning_angle)
+            return None
+        # Confirmed a peak: it ends the current rep and starts the next one
+        return self._complete_rep(turning_frame)
+
+    def _complete_rep(self, end_frame: int):
+        start_frame, trough = self._peak_frame, self._trough
+        self._peak_frame, self._trough = end_frame, None
+        if start_frame is None or trough is None: return None
+
+        duration = (end_frame - start_frame) / self.fps
+        if not self.min_duration < duration < self.max_duration: return None
+        self.count += 1
+        return RepEvent(start_frame, trough[0], end_frame, float(trough[1]), duration)
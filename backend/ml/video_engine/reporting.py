@@ -1,6 +1,55 @@
 import json
-from dataclasses import dataclass, asdict
-from typing import List, Tuple
+from dataclasses import dataclass, asdict, field, replace as dataclass_replace
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+REP_COLUMNS = ('start_frame', 'bottom_frame', 'end_frame', 'duration', 'eccentric_sec', 'concentric_sec', 'min_angle')
+
+@dataclass
+class RepTable:
+    """
+    Per-rep results stored column-wise: one NumPy array per field, one row per
+    rep. Frames are source-video frame numbers; `flags` is a (reps, len(flag_names))
+    bool matrix of the form rules that fired during each rep.
+    """
+    start_frame: np.ndarray
+    bottom_frame: np.ndarray
+    end_frame: np.ndarray
+    duration: np.ndarray
+    eccentric_sec: np.ndarray
+    concentric_sec: np.ndarray
+    min_angle: np.ndarray
+    flags: np.ndarray
+    flag_names: List[str]
+
+    def __len__(self):
+        return len(self.start_frame)
+
+    def offset_frames(self, first_frame: int):
+        """Shifts the frame columns of a table built from a clip that starts at first_frame of the source video."""
+        for name in ('start_frame', 'bottom_frame', 'end_frame'):
+            setattr(self, name, getattr(self, name) + np.int32(first_frame))
+
+    def form_issue_reps(self) -> Dict[str, List[int]]:
+        """Feedback string -> indices of the reps it fired in, for flags that fired at all."""
+        return {name: np.flatnonzero(self.flags[:, i]).tolist() for i, name in enumerate(self.flag_names) if self.flags[:, i].any()}
+
+    def to_dict(self) -> dict:
+        """JSON-ready columns; flags become the list of fired feedback strings per rep."""
+        data = {name: getattr(self, name).tolist() for name in REP_COLUMNS}
+        data['flags'] = [[name for name, fired in zip(self.flag_names, row) if fired] for row in self.flags]
+        return data
+
+def save_rep_table(table: RepTable, output_path: str):
+    """Saves a RepTable as a compressed .npz of its columns (a few bytes per rep)."""
+    columns = {name: getattr(table, name) for name in REP_COLUMNS}
+    np.savez_compressed(output_path, flags=np.packbits(table.flags, axis=1), flag_count=len(table.flag_names),
+                        flag_names=np.array(table.flag_names, dtype=str), **columns)
+
+def load_rep_table(path: str) -> RepTable:
+    with np.load(path) as data:
+        flags = np.unpackbits(data['flags'], axis=1, count=int(data['flag_count'])).astype(bool)
+        return RepTable(flags=flags, flag_names=data['flag_names'].tolist(), **{name: data[name] for name in REP_COLUMNS})
 
 @dataclass
 class AnalysisReport:
@@ -15,9 +64,52 @@ class AnalysisReport:
     min_angle_range: Tuple[float, float]
     workout_intensity: str  # e.g., 'Low', 'Moderate', 'High'
     form_feedback: List[str]
+    # Feedback string -> indices of the reps it fired in
+    form_issue_reps: Dict[str, List[int]] = field(default_factory=dict)
+    # Only filled when stage timings are collected, see StageTimings.summary()
+    timings: Optional[Dict] = None
+    # Rep-level detail; saved with save_rep_table, or in the JSON only when asked for
+    reps: Optional[RepTable] = field(default=None, repr=False)
 
-def save_report_as_json(report: AnalysisReport, output_path: str):
-    """Saves the AnalysisReport to a JSON file."""
+@dataclass
+class ExerciseSegment:
+    """One exercise bout detected in a multi-exercise session, with its own report."""
+    exercise: str
+    start_sec: float
+    end_sec: float
+    report: AnalysisReport
+
+@dataclass
+class PersonReport:
+    """The report of one tracked athlete in a group video."""
+    person_id: int
+    first_seen_sec: float
+    last_seen_sec: float
+    report: AnalysisReport
+
+def _report_dict(report: AnalysisReport, include_reps: bool = False) -> dict:
+    data = asdict(dataclass_replace(report, reps=None))
+    if data['timings'] is None: del data['timings']
+    if include_reps and report.reps is not None: data['reps'] = report.reps.to_dict()
+    else: del data['reps']
+    return data
+
+def save_report_as_json(report: AnalysisReport, output_path: str, include_reps: bool = False):
+    """Saves the AnalysisReport to a JSON file; the per-rep table only with include_reps."""
+    print(f"\nSaving detailed report to: {output_path}")
+    with open(output_path, 'w') as f:
+        json.dump(_report_dict(report, include_reps), f, indent=4)
+
+def save_segments_as_json(segments: List, output_path: str, include_reps: bool = False):
+    """
+    Saves a list of ExerciseSegment (multi-exercise session) or PersonReport
+    (group video) to a JSON file.
+    """
     print(f"\nSaving detailed report to: {output_path}")
+    data = [
+        dict({name: value for name, value in vars(item).items() if name != 'report'},
+             report=_report_dict(item.report, include_reps))
+        for item in segments
+    ]
     with open(output_path, 'w') as f:
-        json.dump(asdict(report), f, indent=4)
\ No newline at end of file
+        json.dump(data, f, indent=4)
\ No newline at end of file
@@ -0,0 +1,98 @@
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+from backend.ml.video_engine.analysis_engine import ExerciseAnalyzer
+from backend.ml.video_engine.exercise_logic import ExerciseLogic
+from backend.ml.video_engine.instrumentation import StageTimings
+from backend.ml.video_engine.landmark_cache import LandmarkCache
+from backend.ml.video_engine.pose_pool import spawn_context
+from backend.ml.video_engine.reporting import AnalysisReport
+
+def plan_segments(total_frames: int, fps: float, workers: int, segment_seconds: float = 60.0):
+    """
+    Splits [0, total_frames) into contiguous (start, end) segments: at least one
+    per worker, and none longer than segment_seconds so work balances across the pool.
+    """
+    count = max(workers, math.ceil(total_frames / max(1, segment_seconds * fps)))
+    count = max(1, min(count, total_frames))
+    bounds = np.linspace(0, total_frames, count + 1).astype(int)
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:])]
+
+def _extract_segment(video_path: str, logic: ExerciseLogic, start: int, end: int, overlap: int, analyzer_kwargs: dict):
+    """
+    Worker: extracts landmarks for [start, end) with its own Pose instance.
+    Extraction begins `overlap` frames early so the pose tracker has locked on by
+    `start`; those warm-up rows are dropped, the previous segment owns them.
+    """
+    analyzer = ExerciseAnalyzer(exercise_logic=logic, batch_rules=True, **analyzer_kwargs)
+    landmarks, fps, total_frames, frame_indices = analyzer._extract_landmarks(video_path, max(0, start - overlap), end)
+    keep = frame_indices >= start
+    return landmarks[keep], frame_indices[keep]
+
+def extract_video_segments(video_path: str, logic: ExerciseLogic, workers: int, segment_seconds: float = 60.0,
+                           overlap_seconds: float = 2.0, timings: StageTimings = None, on_progress=None,
+                           landmark_cache: LandmarkCache = None, **analyzer_kwargs):
+    """
+    Extracts the landmark tensor of one video with a process pool: each worker
+    handles one time segment and the segments are stitched back into a single
+    tensor in frame order. Returns (landmarks, fps, total_frames, frame_indices).
+    With timings, the pool's wall time is recorded as one segment_extraction stage;
+    per-frame stages are not collected from the workers. on_progress (if given)
+    is called with the fraction of segments done as each one finishes.
+    With a landmark_cache, the stitched tensor is stored under a hash of the
+    video, the pose config and the segment layout, and a cached one is
+    returned without starting the pool.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened(): raise IOError(f"Could not open video file: {video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps == 0: fps = 30 # Default FPS if not available
+    cap.release()
+
+    segments = plan_segments(total_frames, fps, workers, segment_seconds)
+    # The frame count is only an estimate: the last segment reads until the stream ends
+    segments[-1] = (segments[-1][0], None)
+    overlap = int(round(overlap_seconds * fps))
+    if landmark_cache is not None:
+        # The tracker re-locks at every boundary, so the layout is part of the key
+        config = dict(ExerciseAnalyzer(exercise_logic=logic, **analyzer_kwargs)._cache_config(),
+                      segments=segments, overlap=overlap)
+        key = landmark_cache.key(video_path, config)
+        cached = landmark_cache.load(key)
+        if cached is not None:
+            print("Pass 1 skipped: using cached landmarks.")
+            return cached
+    print(f"Analysing {len(segments)} segments across {workers} workers...")
+    t = timings.start() if timings else 0.0
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=spawn_context()) as pool:
+        futures = [
+            pool.submit(_extract_segment, video_path, logic, start, end, overlap, analyzer_kwargs)
+            for start, end in segments
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result() # Fail fast if a segment failed
+            if on_progress: on_progress(done / len(futures))
+        parts = [future.result() for future in futures]
+    if timings: timings.record('segment_extraction', t)
+
+    landmarks = np.concatenate([part[0] for part in parts])
+    frame_indices = np.concatenate([part[1] for part in parts])
+    if len(frame_indices): total_frames = max(total_frames, int(frame_indices[-1]) + 1)
+    if landmark_cache is not None: landmark_cache.store(key, landmarks, fps, total_frames, frame_indices)
+    return landmarks, fps, total_frames, frame_indices
+
+def analyze_video_segments(video_path: str, logic: ExerciseLogic, workers: int, segment_seconds: float = 60.0,
+                           overlap_seconds: float = 2.0, timings: StageTimings = None, on_progress=None,
+                           landmark_cache: LandmarkCache = None, **analyzer_kwargs) -> AnalysisReport:
+    """
+    Analyses one video with a process pool (see extract_video_segments). Reps
+    and form rules are evaluated once over the whole stitched series, so a rep
+    spanning a boundary is counted exactly once.
+    """
+    landmarks, fps, total_frames, frame_indices = extract_video_segments(
+        video_path, logic, workers, segment_seconds, overlap_seconds, timings, on_progress, landmark_cache, **analyzer_kwargs)
+    analyzer = ExerciseAnalyzer(exercise_logic=logic, batch_rules=True, timings=timings, **analyzer_kwargs)
+    return analyzer.evaluate_landmarks(landmarks, fps, total_frames, frame_indices)
@@ -0,0 +1,46 @@
+import numpy as np
+
+class SignalSeries:
+    """
+    Preallocated columnar storage for the frame-by-frame extraction pass: one
+    float32 column per named signal (NaN where no pose was found), one bool
+    column per form rule and the source frame index of every sample.
+
+    Capacity starts at the expected sample count, normally
+    CAP_PROP_FRAME_COUNT, and only doubles when a container under-reports it,
+    so a whole session costs a few bytes per frame and no list-to-array copy.
+    """
+    def __init__(self, capacity: int, signals, flags):
+        capacity = max(1, capacity)
+        self.signals = {name: i for i, name in enumerate(signals)}
+        self.flag_names = list(flags)
+        self.values = np.full((capacity, len(self.signals)), np.nan, dtype=np.float32)
+        self.flags = np.zeros((capacity, len(self.flag_names)), dtype=bool)
+        self.frame_indices = np.zeros(capacity, dtype=np.int64)
+        self.length = 0
+
+    def append(self, frame_idx: int) -> int:
+        """Adds an empty (NaN, no flags) sample for frame_idx and returns its row."""
+        if self.length == len(self.frame_indices): self._grow()
+        row = self.length
+        self.frame_indices[row] = frame_idx
+        self.length += 1
+        return row
+
+    def _grow(self):
+        capacity = 2 * len(self.frame_indices)
+        values = np.full((capacity, self.values.shape[1]), np.nan, dtype=np.float32)
+        values[:self.length] = self.values
+        flags = np.zeros((capacity, self.flags.shape[1]), dtype=bool)
+        flags[:self.length] = self.flags
+        frame_indices = np.zeros(capacity, dtype=np.int64)
+        frame_indices[:self.length] = self.frame_indices
+        self.values, self.flags, self.frame_indices = values, flags, frame_indices
+
+    def signal(self, name: str) -> np.ndarray:
+        """View of one signal column over the samples stored so far."""
+        return self.values[:self.length, self.signals[name]]
+
+    def flag_masks(self) -> dict:
+        """Per-sample boolean masks keyed by flag name."""
+        return {name: self.flags[:self.length, i] for i, name in enumerate(self.flag_names)}
@@ -1,38 +1,196 @@
 import uuid
 import os
-from fastapi import APIRouter, UploadFile, File, Form, BackgroundTasks, HTTPException
-from backend.schemas import AnalysisResponse, TaskStatus
-from backend.services.ml_video import run_full_analysis, task_statuses
+import json
+from typing import Optional
+from fastapi import APIRouter, Form, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from backend.schemas import AnalysisResponse, TaskStatus, UploadStatus
+from backend.services.ml_video import (
+    submit_video_analysis, submit_landmark_analysis, get_task_status, get_task_events, MAX_LANDMARK_FRAMES
+)
+from backend.services.ml_live import run_live_session
+from backend.services.upload_service import (
+    receive_file_upload, check_video_upload, create_resumable_upload, get_resumable_upload,
+    append_resumable_upload, delete_resumable_upload, finalize_resumable_upload
+)
+from backend.ml.video_engine.pose_pool import MODEL_COMPLEXITY
+from backend.ml.video_engine.exercise_logic import EXERCISE_LOGICS
+from backend.ml.video_engine.landmarks import NUM_LANDMARKS, load_landmark_upload
 
 router = APIRouter(prefix="/ml", tags=["Analysis"])
 UPLOADS_DIR = "uploads"
+SSE_KEEPALIVE_SECONDS = 15 # Below common proxy idle timeouts
 
 
-@router.post("/analyze", response_model=AnalysisResponse)
-async def analyze_video(
-    background_tasks: BackgroundTasks,
+def _check_analysis_options(exercise_type, model_complexity):
+    if exercise_type != 'auto' and exercise_type not in EXERCISE_LOGICS:
+        raise HTTPException(status_code=400, detail=f"Unknown exercise type: {exercise_type}")
+    if model_complexity is not None and model_complexity not in MODEL_COMPLEXITY:
+        raise HTTPException(status_code=400, detail=f"model_complexity must be one of {list(MODEL_COMPLEXITY)}")
+
+
+def _analysis_response(task_id: str, queued_id: str) -> dict:
+    if queued_id == task_id: return {"task_id": task_id, "message": "Analysis has started."}
+    return {"task_id": queued_id, "message": "This upload was already submitted; following the existing analysis."}
+
+
+VIDEO_UPLOAD_FORM = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["exercise_type", "video"],
+            "properties": {
+                "exercise_type": {"type": "string"},
+                "video": {"type": "string", "format": "binary"},
+                "model_complexity": {"type": "string", "enum": list(MODEL_COMPLEXITY)},
+            },
+        }}},
+    }
+}
+
+
+LANDMARK_UPLOAD_FORM = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["exercise_type", "fps", "width", "height", "landmarks"],
+            "properties": {
+                "exercise_type": {"type": "string"},
+                "fps": {"type": "number"},
+                "width": {"type": "integer"},
+                "height": {"type": "integer"},
+                "landmarks": {"type": "string", "format": "binary"},
+            },
+        }}},
+    }
+}
+
+
+@router.post("/analyze", response_model=AnalysisResponse, openapi_extra=VIDEO_UPLOAD_FORM)
+async def analyze_video(request: Request):
+    """
+    This endpoint accepts a video and an exercise type (multipart form fields
+    `video`, `exercise_type` and optionally `model_complexity`, which overrides
+    the server's default pose model), saves the video, and queues it for the
+    analysis workers. The video is streamed to disk as it arrives, so uploads
+    over MAX_UPLOAD_MB or MAX_VIDEO_SECONDS are rejected with 413.
+    """
+    # Generate a unique ID for this analysis task
+    task_id = str(uuid.uuid4())
+
+    # Stream the video file to disk
+    fields, video = await receive_file_upload(request, "video", UPLOADS_DIR, task_id)
+    exercise_type = fields.get("exercise_type")
+    model_complexity = fields.get("model_complexity") or None
+    try:
+        _check_analysis_options(exercise_type, model_complexity)
+    except HTTPException:
+        os.remove(video["path"])
+        raise
+    await check_video_upload(video["path"])
+
+    # Queue the long-running analysis for the worker processes
+    # An identical video that was already analysed (or is being analysed) is not run again
+    queued_id = await run_in_threadpool(submit_video_analysis, video["path"], exercise_type, task_id, model_complexity,
+                                        video["sha256"])
+
+    # Immediately return the task ID to the client
+    return _analysis_response(task_id, queued_id)
+
+
+@router.post("/uploads", response_model=UploadStatus, status_code=201)
+async def create_upload(
+    filename: str = Form(...),
     exercise_type: str = Form(...),
-    video: UploadFile = File(...)
+    model_complexity: Optional[str] = Form(None),
+    length: Optional[int] = Form(None)
 ):
     """
-    This endpoint accepts a video and an exercise type,
-    saves the video, and starts the analysis in the background.
+    Starts a resumable video upload for unreliable connections. Send the
+    bytes with PATCH /uploads/{upload_id} (any number of requests, each
+    continuing at the current offset), then POST /uploads/{upload_id}/finalize
+    to start the analysis. length is the total size in bytes, if known upfront.
     """
-    # Generate a unique ID for this analysis task
+    _check_analysis_options(exercise_type, model_complexity)
+    upload_id = await run_in_threadpool(create_resumable_upload, UPLOADS_DIR, filename, length,
+                                        exercise_type=exercise_type, model_complexity=model_complexity)
+    return {"upload_id": upload_id, "offset": 0, "length": length}
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadStatus)
+async def get_upload(upload_id: str):
+    """Reports how many bytes of the upload the server has: resume from this offset after a dropped connection."""
+    upload = await run_in_threadpool(get_resumable_upload, UPLOADS_DIR, upload_id)
+    return {"upload_id": upload_id, "offset": upload["offset"], "length": upload["length"]}
+
+
+@router.patch("/uploads/{upload_id}", response_model=UploadStatus)
+async def append_upload(request: Request, upload_id: str, upload_offset: int = Header(...)):
+    """
+    Appends the raw request body to the upload. The Upload-Offset header must
+    match the server's offset (409 otherwise); bytes received before a
+    dropped connection are kept.
+    """
+    offset = await append_resumable_upload(request, UPLOADS_DIR, upload_id, upload_offset)
+    upload = await run_in_threadpool(get_resumable_upload, UPLOADS_DIR, upload_id)
+    return {"upload_id": upload_id, "offset": offset, "length": upload["length"]}
+
+
+@router.delete("/uploads/{upload_id}", status_code=204)
+async def delete_upload(upload_id: str):
+    """Abandons an upload and deletes its data (409 while a PATCH or finalize for it is in progress)."""
+    await run_in_threadpool(delete_resumable_upload, UPLOADS_DIR, upload_id)
+
+
+@router.post("/uploads/{upload_id}/finalize", response_model=AnalysisResponse)
+async def finalize_upload(upload_id: str):
+    """Completes the upload and queues the video for analysis, as /analyze does."""
     task_id = str(uuid.uuid4())
+    upload, video = await run_in_threadpool(finalize_resumable_upload, UPLOADS_DIR, upload_id, task_id)
+    await check_video_upload(video["path"])
+    queued_id = await run_in_threadpool(submit_video_analysis, video["path"], upload["exercise_type"], task_id,
+                                        upload["model_complexity"], video["sha256"])
+    return _analysis_response(task_id, queued_id)
 
-    # Define the path to save the uploaded video
-    video_path = os.path.join(UPLOADS_DIR, f"{task_id}_{video.filename}")
 
-    # Save the video file
-    with open(video_path, "wb") as buffer:
-        buffer.write(await video.read())
+@router.post("/analyze_landmarks", response_model=AnalysisResponse, openapi_extra=LANDMARK_UPLOAD_FORM)
+async def analyze_landmarks(request: Request):
+    """
+    Analysis for clients that run pose estimation on-device. Instead of the
+    video, the client uploads its normalized landmarks (multipart field
+    `landmarks`: an .npz with a `landmarks` array and optional `frame_indices`,
+    or raw float32 frames x 33 x 4) with the video's `fps`, `width` and
+    `height` and the `exercise_type`. Only the exercise logic and rep
+    analysis run on the server; poll /status/{task_id} as for /analyze.
+    """
+    task_id = str(uuid.uuid4())
+    # Sized for raw float32 landmarks at the frame limit
+    max_bytes = MAX_LANDMARK_FRAMES * NUM_LANDMARKS * 4 * 4
+    fields, upload = await receive_file_upload(request, "landmarks", UPLOADS_DIR, task_id, max_bytes)
+    try:
+        exercise_type = fields.get("exercise_type")
+        if exercise_type not in EXERCISE_LOGICS:
+            raise HTTPException(status_code=400, detail=f"Unknown exercise type: {exercise_type}")
+        try:
+            fps, width, height = float(fields["fps"]), int(fields["width"]), int(fields["height"])
+        except (KeyError, ValueError):
+            raise HTTPException(status_code=400, detail="fps, width and height are required numbers")
+        if not 0 < fps <= 1000 or width <= 0 or height <= 0:
+            raise HTTPException(status_code=400, detail="fps, width and height must be positive")
 
-    # Add the long-running analysis function to the background tasks
-    background_tasks.add_task(run_full_analysis, video_path, exercise_type, task_id)
+        try:
+            points, frame_indices = await run_in_threadpool(load_landmark_upload, upload["path"], (height, width), MAX_LANDMARK_FRAMES)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # submit_landmark_analysis keeps its own copy of the validated landmarks
+        os.remove(upload["path"])
 
-    # Immediately return the task ID to the client
-    return {"task_id": task_id, "message": "Analysis has started."}
+    queued_id = await run_in_threadpool(submit_landmark_analysis, points, fps, frame_indices, exercise_type, task_id)
+    return _analysis_response(task_id, queued_id)
 
 
 @router.get("/status/{task_id}", response_model=TaskStatus)
@@ -41,8 +199,44 @@ async def get_analysis_status(task_id: str):
     This endpoint allows the client to poll for the status
     of an analysis task using its ID.
     """
-    status = task_statuses.get(task_id)
+    status = await run_in_threadpool(get_task_status, task_id)
     if not status:
         raise HTTPException(status_code=404, detail="Task not found")
 
     return status
+
+
+@router.get("/status/{task_id}/events")
+async def stream_analysis_status(task_id: str):
+    """
+    Server-Sent Events alternative to polling /status/{task_id}: the
+    connection stays open and a `status` event (the same JSON as /status) is
+    pushed on every status or progress change, ending with the final result.
+    """
+    if not await run_in_threadpool(get_task_status, task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    async def events():
+        async for status in get_task_events().subscribe(task_id, keepalive=SSE_KEEPALIVE_SECONDS):
+            yield ": keepalive\n\n" if status is None else f"event: status\ndata: {json.dumps(status)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/live/{exercise_type}")
+async def live_analysis(websocket: WebSocket, exercise_type: str):
+    """
+    Live analysis over a WebSocket. The client streams JPEG frames (binary
+    messages) or on-device landmarks (JSON text messages) and receives rep
+    events and form warnings as they happen.
+    """
+    if exercise_type not in EXERCISE_LOGICS:
+        await websocket.close(code=1008, reason=f"Unknown exercise type: {exercise_type}")
+        return
+
+    await websocket.accept()
+    try:
+        await run_live_session(websocket, exercise_type)
+    except WebSocketDisconnect:
+        pass
@@ -92,6 +92,13 @@ class AnalysisResponse(BaseModel):
     message: str
 
 
+class UploadStatus(BaseModel):
+    upload_id: str
+    offset: int
+    length: Optional[int] = None
+
+
 class TaskStatus(BaseModel):
     status: str
     result: Optional[str] = None
+    progress: Optional[float] = None
@@ -0,0 +1,191 @@
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    dedup_key TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key);
+"""
+
+class JobQueue:
+    """
+    Durable job queue in a SQLite file, shared by the API processes (which
+    enqueue jobs and read their status) and the analysis workers (which claim
+    and run them). Every call opens its own connection, so one JobQueue can be
+    used from any thread or process.
+
+    A job goes queued -> processing -> complete, or back to queued after a
+    failed attempt (with exponential backoff) until max_attempts, then failed.
+    result only ever holds the result of a complete job; error holds the
+    error of the last failed attempt.
+    A claim holds a lease that the worker renews while it runs the job; if
+    the worker dies, the lease expires and another worker claims the job.
+    """
+    def __init__(self, db_path: str, lease_seconds: float = 120.0, retry_delay: float = 5.0):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        db = sqlite3.connect(db_path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL") # Status reads don't block writers
+            columns = [row[1] for row in db.execute("PRAGMA table_info(jobs)")]
+            if columns and 'dedup_key' not in columns: db.execute("ALTER TABLE jobs ADD COLUMN dedup_key TEXT")
+            if columns and 'error' not in columns:
+                # Errors used to be stored in result
+                db.execute("ALTER TABLE jobs ADD COLUMN error TEXT")
+                db.execute("UPDATE jobs SET error = result, result = NULL WHERE status != 'complete'")
+                db.commit()
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self, write: bool = True):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            # Writers take the lock up front so two workers can't claim the same job
+            db.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def enqueue(self, job_id: str, kind: str, payload: dict, max_attempts: int = 3, dedup_key: str = None) -> str:
+        """
+        Adds a job and returns its id. With a dedup_key, a job with the same
+        key that is queued, processing or complete is returned instead (so
+        identical submissions share one run and its result); failed jobs are
+        not reused.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            if dedup_key is not None:
+                row = db.execute(
+                    "SELECT id FROM jobs WHERE dedup_key = ? AND status != 'failed' ORDER BY created_at DESC LIMIT 1",
+                    (dedup_key,)
+                ).fetchone()
+                if row is not None: return row['id']
+            db.execute(
+                "INSERT INTO jobs (id, kind, payload, status, max_attempts, available_at, created_at, updated_at, dedup_key) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), max_attempts, now, now, now, dedup_key)
+            )
+        return job_id
+
+    def claim(self, worker: str, on_failed=None):
+        """
+        Leases the oldest runnable job to worker; returns it as a dict, or None
+        if there is none. Jobs whose last attempt died with its worker are
+        failed on the way; on_failed(job) (if given) is called for each of
+        them once the claim is committed, e.g. to clean up their input.
+        """
+        now = time.time()
+        failed, job = [], None
+        with self._transaction() as db:
+            while True:
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+                    "OR (status = 'processing' AND lease_expires < ?) ORDER BY available_at LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is None: break
+                if row['attempts'] >= row['max_attempts']:
+                    # Its last attempt died with the worker running it
+                    db.execute("UPDATE jobs SET status = 'failed', error = ?, worker = NULL, updated_at = ? WHERE id = ?",
+                               ("Analysis worker stopped while processing the job.", now, row['id']))
+                    failed.append(dict(row, payload=json.loads(row['payload'])))
+                    continue
+                db.execute(
+                    "UPDATE jobs SET status = 'processing', progress = 0, attempts = attempts + 1, worker = ?, "
+                    "lease_expires = ?, updated_at = ? WHERE id = ?",
+                    (worker, now + self.lease_seconds, now, row['id'])
+                )
+                job = dict(row)
+                job['payload'] = json.loads(job['payload'])
+                job['attempts'] += 1
+                break
+
+        if on_failed:
+            for failed_job in failed: on_failed(failed_job)
+        return job
+
+    def heartbeat(self, job_id: str, worker: str, progress: float = None) -> bool:
+        """Renews the lease (and records progress, 0-1). False if the job is no longer held by worker."""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ?, progress = COALESCE(?, progress), updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'processing'",
+                (now + self.lease_seconds, progress, now, job_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker: str, result: str) -> bool:
+        """Stores the result; False if the job was meanwhile taken over by another worker."""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'complete', progress = 1, result = ?, worker = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ?",
+                (result, time.time(), job_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> bool:
+        """
+        Records a failed attempt; retry=False fails the job for good (e.g. bad
+        input). Returns True if the job will run again (it is retried, or was
+        meanwhile taken over by another worker), False if it failed for good.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ?", (job_id, worker)).fetchone()
+            if row is None: return True
+            retry = retry and row['attempts'] < row['max_attempts']
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, worker = NULL, available_at = ?, updated_at = ? WHERE id = ?",
+                ('queued' if retry else 'failed', error, now + self.retry_delay * 2 ** (row['attempts'] - 1), now, job_id)
+            )
+            return retry
+
+    def get_many(self, job_ids) -> dict:
+        """Returns {job id: job} for the ids that exist, in as few queries as possible."""
+        job_ids, jobs = list(job_ids), {}
+        with self._transaction(write=False) as db:
+            for start in range(0, len(job_ids), 500):
+                chunk = job_ids[start:start + 500]
+                rows = db.execute(f"SELECT * FROM jobs WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                for row in rows:
+                    jobs[row['id']] = dict(row, payload=json.loads(row['payload']))
+        return jobs
+
+    def get(self, job_id: str):
+        """Returns the job as a dict, or None if it doesn't exist."""
+        with self._transaction(write=False) as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None: return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        return job
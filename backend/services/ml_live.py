@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import asyncio
+import cv2
+import numpy as np
+from fastapi import WebSocket
+from starlette.concurrency import run_in_threadpool
+from backend.ml.video_engine.exercise_logic import EXERCISE_LOGICS
+from backend.ml.video_engine.landmarks import NUM_LANDMARKS, scale_landmarks
+from backend.ml.video_engine.live import LiveSession
+
+QUEUE_SIZE = 4 # Frames buffered per connection before the oldest is dropped
+MAX_LAG = 0.5 # Seconds a queued frame may wait before it is too stale to analyse
+# Admission control: connections beyond these limits are closed with 1013 (try again later)
+MAX_LIVE_SESSIONS = int(os.getenv("MAX_LIVE_SESSIONS", "32"))
+LIVE_POSE_TIMEOUT = float(os.getenv("LIVE_POSE_TIMEOUT", "1")) # Seconds a JPEG session waits for a free Pose
+TRY_AGAIN_LATER = 1013
+
+_active_sessions = 0 # Only touched from the event loop
+
+def _decode_message(message: dict):
+    """
+    Binary messages are JPEG frames. Text messages are JSON landmark frames:
+    {"landmarks": 33 x [x, y, z, visibility] normalized as MediaPipe outputs,
+    "width": ..., "height": ..., "timestamp": seconds (optional)}.
+    Returns (kind, payload, client timestamp or None).
+    """
+    if message.get("bytes") is not None:
+        return "jpeg", message["bytes"], None
+    data = json.loads(message["text"])
+    points = np.asarray(data["landmarks"], dtype=np.float32)
+    if points.shape != (NUM_LANDMARKS, 4): raise ValueError(f"landmarks must be {NUM_LANDMARKS} x 4")
+    return "landmarks", scale_landmarks(points, (data["height"], data["width"])), data.get("timestamp")
+
+def _analyse(session: LiveSession, kind: str, payload, timestamp: float):
+    if kind == "jpeg":
+        frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None: raise ValueError("Could not decode JPEG frame")
+        return session.process_frame(frame, timestamp)
+    return session.update_landmarks(payload, timestamp)
+
+async def _receive(websocket: WebSocket, queue: asyncio.Queue, stats: dict):
+    """Reads client messages into the bounded queue, dropping the oldest frame when it is full."""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect": break
+            item = (message, time.monotonic())
+            if queue.full():
+                queue.get_nowait()
+                stats["dropped"] += 1
+            queue.put_nowait(item)
+    finally:
+        # Always end the session, even if receive() raised (e.g. WebSocketDisconnect)
+        if queue.full(): queue.get_nowait()
+        queue.put_nowait(None)
+
+async def run_live_session(websocket: WebSocket, exercise_type: str):
+    """
+    Streams live analysis over an accepted WebSocket. Incoming frames are
+    analysed in a worker thread one at a time; while that runs, new frames
+    wait in a small per-connection queue that drops the oldest frame under
+    load, and frames that waited longer than MAX_LAG are skipped, so
+    feedback stays close to real time. The client receives
+    {"type": "rep", ...} when a rep completes, {"type": "warnings", ...}
+    when the active form warnings change and {"type": "error", ...} for a
+    malformed message.
+
+    At most MAX_LIVE_SESSIONS run at once, and a JPEG session holds one
+    pooled Pose for its lifetime; when either runs out the connection is
+    closed with code 1013, rather than parking a threadpool thread on the
+    pool until a Pose frees up.
+    """
+    global _active_sessions
+    if _active_sessions >= MAX_LIVE_SESSIONS:
+        await websocket.close(code=TRY_AGAIN_LATER, reason="Too many live sessions")
+        return
+
+    _active_sessions += 1
+    session = LiveSession(EXERCISE_LOGICS[exercise_type](), pose_timeout=LIVE_POSE_TIMEOUT)
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    stats = {"dropped": 0}
+    receiver = asyncio.create_task(_receive(websocket, queue, stats))
+    warnings, start = [], time.monotonic()
+    try:
+        while True:
+            item = await queue.get()
+            if item is None: break
+            message, received = item
+            if time.monotonic() - received > MAX_LAG:
+                stats["dropped"] += 1
+                continue
+
+            try:
+                kind, payload, timestamp = _decode_message(message)
+                state = await run_in_threadpool(_analyse, session, kind, payload,
+                                                received - start if timestamp is None else timestamp)
+            except (ValueError, KeyError, TypeError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            except TimeoutError:
+                await websocket.close(code=TRY_AGAIN_LATER, reason="No pose estimator free")
+                break
+
+            if state.rep:
+                await websocket.send_json({
+                    "type": "rep",
+                    "count": state.rep_count,
+                    "duration": round(state.rep.duration, 2),
+                    "min_angle": round(state.rep.min_angle, 1),
+                    "dropped_frames": stats["dropped"],
+                })
+            if state.warnings != warnings:
+                warnings = state.warnings
+                await websocket.send_json({"type": "warnings", "warnings": warnings})
+    finally:
+        _active_sessions -= 1
+        receiver.cancel()
+        # Shielded so a cancelled connection still returns its Pose to the pool
+        await asyncio.shield(run_in_threadpool(session.close))
@@ -2,24 +2,52 @@ import google.generativeai as genai
 import json
 from dotenv import load_dotenv
 import os
+from backend.services.summary_cache import SummaryCache
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-genai.configure(api_key=GOOGLE_API_KEY)
-
 try:
     genai.configure(api_key=GOOGLE_API_KEY)
 except Exception as e:
     print(f"Error configuring Google AI: {e}")
 
-def get_ai_summary(analysis_json: str) -> str:
+# 'gemini-2.5-flash' or any other Gemini model; 'stub' writes a canned summary locally, for tests and offline runs
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-2.5-flash")
+# Bump whenever the prompt changes, so cached summaries are regenerated
+PROMPT_VERSION = 1
+
+summary_cache = SummaryCache(
+    os.getenv("SUMMARY_CACHE_DIR", "summary_cache"),
+    max_entries=int(os.getenv("SUMMARY_CACHE_ENTRIES", "256")),
+    max_bytes=int(os.getenv("SUMMARY_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    ttl=float(os.getenv("SUMMARY_CACHE_TTL_HOURS", "168")) * 3600
+)
+
+# Report fields the coach doesn't use: profiling output and rep-level detail
+_IGNORED_FIELDS = ("timings", "reps")
+
+def canonical_report(report):
     """
-    Sends the analysis JSON to the AI model with a specific prompt
-    and returns the generated user-friendly summary.
+    Reduces a report (or a multi-exercise / group report) to what the summary
+    depends on, so reports that only differ in noise share a summary: unused
+    fields are dropped, floats rounded to one decimal and, since the prompt
+    ignores everything else when no reps were detected, a 0-rep report is
+    just its exercise and rep count.
     """
+    if isinstance(report, dict):
+        if report.get("total_repetitions") == 0:
+            return {"exercise_type": report.get("exercise_type"), "total_repetitions": 0}
+        return {key: canonical_report(value) for key, value in sorted(report.items()) if key not in _IGNORED_FIELDS}
+    if isinstance(report, (list, tuple)):
+        return [canonical_report(value) for value in report]
+    if isinstance(report, float):
+        return round(report, 1)
+    return report
+
+def build_prompt(analysis_json: str) -> str:
     # The master prompt designed to get the best response from the AI
-    prompt = f"""
+    return f"""
     Role and Goal:
     You are "Forma," an encouraging and knowledgeable AI fitness coach. Your goal is to provide a motivational summary of a user's workout based on a JSON analysis report. You must be positive and constructive, focusing on celebrating progress while offering clear, simple, and actionable advice.
 
@@ -40,10 +68,43 @@ def get_ai_summary(analysis_json: str) -> str:
     {analysis_json}
     """
 
+def _stub_summary(report) -> str:
+    """A deterministic summary built from the report alone, without calling an external model."""
+    # Multi-exercise and group reports are lists of items with a nested report
+    reports = [item["report"] for item in report] if isinstance(report, list) else [report]
+    lines = ["Great job getting your workout in!", "", "## Your Workout Snapshot"]
+    for part in reports:
+        lines.append(f"- {part.get('exercise_type')}: {part.get('total_repetitions', 0)} reps")
+        lines.extend(f"  - {feedback}" for feedback in part.get("form_feedback", []))
+    return "\n".join(lines)
+
+def _generate_summary(prompt: str, report) -> str:
+    if SUMMARY_MODEL == "stub":
+        return _stub_summary(report)
+    model = genai.GenerativeModel(SUMMARY_MODEL)
+    return model.generate_content(prompt).text
+
+def get_ai_summary(analysis_json: str) -> str:
+    """
+    Sends the analysis JSON to the AI model with a specific prompt
+    and returns the generated user-friendly summary.
+
+    Summaries are cached by the canonical report (see canonical_report), the
+    prompt version and the model. The model is only ever sent the canonical
+    report, so a cached summary was written from the same input.
+    Raises RuntimeError if the model call fails, so the analysis job is
+    retried rather than completed without a summary.
+    """
+    report = canonical_report(json.loads(analysis_json))
+    key = SummaryCache.key(report, PROMPT_VERSION, SUMMARY_MODEL)
+    summary = summary_cache.get(key)
+    if summary is not None:
+        return summary
+
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        return response.text
+        summary = _generate_summary(build_prompt(json.dumps(report)), report)
     except Exception as e:
         print(f"An error occurred while calling the AI model: {e}")
-        return "Sorry, there was an issue generating your workout summary. Please try again later."
\ No newline at end of file
+        raise RuntimeError(f"Could not generate the workout summary: {e}") from e
+    summary_cache.put(key, summary)
+    return summary
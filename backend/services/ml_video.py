@@ -1,44 +1,181 @@
 import os
 import json
-from backend.ml.main import run_analysis
-from backend.services.ml_summary import get_ai_summary
+import hashlib
+import logging
+import threading
+import numpy as np
+from backend.ml.main import run_analysis, run_landmark_analysis
+from backend.ml.video_engine.analysis_engine import ENGINE_VERSION
+from backend.ml.video_engine.landmark_cache import LandmarkCache
+from backend.ml.video_engine.pose_pool import get_pose_pool, pose_config
+from backend.ml.video_engine.instrumentation import StageTimings
+from backend.services.ml_summary import get_ai_summary, summary_cache, PROMPT_VERSION
+from backend.services.job_queue import JobQueue
+from backend.services.task_events import TaskEvents, task_status
 
-task_statuses = {}
+logger = logging.getLogger(__name__)
 
-def run_full_analysis(video_path: str, exercise_type: str, task_id: str):
+landmark_cache = LandmarkCache(
+    os.getenv("LANDMARK_CACHE_DIR", "landmark_cache"),
+    max_bytes=int(os.getenv("LANDMARK_CACHE_MAX_MB", "2048")) * 1024 * 1024
+)
+# Deployment default pose model ('lite', 'full' or 'heavy'); requests may override it
+POSE_MODEL_COMPLEXITY = os.getenv("POSE_MODEL_COMPLEXITY", "full")
+POSE_POOL_WARM = int(os.getenv("POSE_POOL_WARM", "1"))
+# Per-stage timings in reports and logs
+ANALYSIS_TIMINGS = os.getenv("ANALYSIS_TIMINGS", "0") == "1"
+# Landmark uploads: 1 hour at 60 fps by default
+MAX_LANDMARK_FRAMES = int(os.getenv("MAX_LANDMARK_FRAMES", "216000"))
+# Analysis jobs are queued in SQLite and run by `python -m backend.worker`
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+
+_job_queue = None
+_task_events = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide JobQueue, opening the database on first use rather than at import."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(JOB_DB_PATH, lease_seconds=JOB_LEASE_SECONDS)
+        return _job_queue
+
+def get_task_events() -> TaskEvents:
+    """Returns the process-wide TaskEvents that pushes status changes to SSE clients."""
+    global _task_events
+    queue = get_job_queue()
+    with _job_queue_lock:
+        if _task_events is None:
+            _task_events = TaskEvents(queue)
+        return _task_events
+
+def warm_pose_pool():
+    """Builds the default Pose instances up front so the first upload doesn't pay for model loading."""
+    get_pose_pool().warm(POSE_POOL_WARM, **pose_config(POSE_MODEL_COMPLEXITY))
+
+def _dedup_key(*inputs) -> str:
+    """Identifies an analysis by its input's content hash and everything else that affects the result."""
+    return hashlib.sha256(json.dumps([ENGINE_VERSION, PROMPT_VERSION, *inputs]).encode()).hexdigest()
+
+def submit_video_analysis(video_path: str, exercise_type: str, task_id: str, model_complexity: str = None,
+                          video_sha256: str = None) -> str:
+    """
+    Queues an uploaded video for the analysis workers (see backend/worker.py)
+    and returns the id of the task to follow. Blocks on the queue database:
+    call it from a worker thread, not the event loop. When the same video was already
+    submitted with the same options (by content hash), that task's id is
+    returned instead, whether it is still running or complete, and the new
+    upload is deleted.
+    """
+    model_complexity = model_complexity or POSE_MODEL_COMPLEXITY
+    payload = {"video_path": video_path, "exercise_type": exercise_type, "model_complexity": model_complexity,
+               "video_sha256": video_sha256}
+    dedup_key = _dedup_key("video", video_sha256, exercise_type, model_complexity) if video_sha256 else None
+    queued_id = get_job_queue().enqueue(task_id, "video", payload, max_attempts=JOB_MAX_ATTEMPTS, dedup_key=dedup_key)
+    if queued_id != task_id and os.path.exists(video_path): os.remove(video_path)
+    return queued_id
+
+def submit_landmark_analysis(landmarks, fps: float, frame_indices, exercise_type: str, task_id: str) -> str:
+    """
+    Stores uploaded landmarks next to the videos and queues them for the
+    analysis workers; returns the task id to follow, which is an earlier
+    task's for identical landmarks (as for submit_video_analysis).
+    Hashes and compresses up to MAX_LANDMARK_FRAMES frames: call it from a
+    worker thread, not the event loop.
+    """
+    if frame_indices is None: frame_indices = np.arange(len(landmarks))
+    digest = hashlib.sha256(np.ascontiguousarray(landmarks).tobytes())
+    digest.update(np.asarray(frame_indices, dtype=np.int64).tobytes())
+    dedup_key = _dedup_key("landmarks", digest.hexdigest(), exercise_type, fps)
+
+    landmarks_path = os.path.join("uploads", f"{task_id}_landmarks.npz")
+    np.savez_compressed(landmarks_path, landmarks=landmarks, frame_indices=frame_indices)
+    payload = {"landmarks_path": landmarks_path, "fps": fps, "exercise_type": exercise_type}
+    queued_id = get_job_queue().enqueue(task_id, "landmarks", payload, max_attempts=JOB_MAX_ATTEMPTS, dedup_key=dedup_key)
+    if queued_id != task_id: os.remove(landmarks_path)
+    return queued_id
+
+def get_task_status(task_id: str):
+    """Status of an analysis task as seen by any API process, or None if it doesn't exist."""
+    job = get_job_queue().get(task_id)
+    return task_status(job) if job else None
+
+def run_job(job: dict, progress=None) -> str:
+    """Runs a claimed analysis job and returns its AI summary; progress(fraction) reports advancement."""
+    payload = job["payload"]
+    if job["kind"] == "landmarks":
+        return run_landmark_task(payload["landmarks_path"], payload["fps"], payload["exercise_type"], job["id"], progress)
+    return run_full_analysis(payload["video_path"], payload["exercise_type"], job["id"], payload["model_complexity"], progress)
+
+def discard_job_input(job: dict):
+    """Deletes the uploaded file of a job that won't run again."""
+    path = job["payload"].get("video_path") or job["payload"].get("landmarks_path")
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def run_full_analysis(video_path: str, exercise_type: str, task_id: str, model_complexity: str = None, progress=None) -> str:
     """
-    The main background task function. It runs the entire pipeline.
+    Runs the entire pipeline on an uploaded video and returns the AI summary.
+    Exceptions propagate so the worker can retry the job.
     """
     json_output_path = f"{os.path.splitext(video_path)[0]}_report.json"
     
     try:
-        # Step 1: Set initial status
-        task_statuses[task_id] = {"status": "processing", "result": None}
-
-        # Step 2: Run the computer vision analysis from your existing engine
+        # Step 1: Run the computer vision analysis from your existing engine
         # Note: This is a synchronous call, it will block until it's done.
-        run_analysis(video_path, exercise_type, json_output_path)
+        # Pose extraction is most of the work: it covers the first 80% of progress
+        run_analysis(video_path, exercise_type, json_output_path, landmark_cache=landmark_cache,
+                     model_complexity=model_complexity or POSE_MODEL_COMPLEXITY, collect_timings=ANALYSIS_TIMINGS,
+                     on_progress=(lambda fraction: progress(0.8 * fraction)) if progress else None)
+        if progress: progress(0.8)
 
-        # Step 3: Read the resulting JSON report
-        with open(json_output_path, 'r') as f:
-            analysis_data = json.load(f)
-        
-        # Step 4: Convert the dictionary to a JSON string for the AI prompt
-        analysis_json_string = json.dumps(analysis_data)
-        
-        # Step 5: Get the user-friendly summary from the AI model
-        ai_summary = get_ai_summary(analysis_json_string)
+        # Step 2: Summarise the JSON report
+        return _summarise(json_output_path, task_id)
         
-        # Step 6: Update the task status to 'complete' with the final result
-        task_statuses[task_id] = {"status": "complete", "result": ai_summary}
+    finally:
+        # Step 3: Clean up the report; the video is kept until the job is done for good
+        if os.path.exists(json_output_path):
+            os.remove(json_output_path)
+
+def run_landmark_task(landmarks_path: str, fps: float, exercise_type: str, task_id: str, progress=None) -> str:
+    """
+    Analysis job for landmarks uploaded by the client: the same report and
+    AI summary as run_full_analysis, without decoding or pose inference.
+    """
+    json_output_path = os.path.join("uploads", f"{task_id}_report.json")
+
+    try:
+        with np.load(landmarks_path) as data:
+            landmarks, frame_indices = data["landmarks"], data["frame_indices"]
+        run_landmark_analysis(landmarks, fps, exercise_type, json_output_path, frame_indices,
+                              collect_timings=ANALYSIS_TIMINGS)
+        if progress: progress(0.8)
+        return _summarise(json_output_path, task_id)
 
-    except Exception as e:
-        print(f"An error occurred during analysis for task {task_id}: {e}")
-        task_statuses[task_id] = {"status": "failed", "result": str(e)}
-        
     finally:
-        # Step 7: Clean up the temporary files
-        if os.path.exists(video_path):
-            os.remove(video_path)
         if os.path.exists(json_output_path):
-            os.remove(json_output_path)
\ No newline at end of file
+            os.remove(json_output_path)
+
+def _summarise(json_output_path: str, task_id: str) -> str:
+    # Read the resulting JSON report
+    with open(json_output_path, 'r') as f:
+        analysis_data = json.load(f)
+    # Stage timings are for the logs, not for the coach; multi-exercise and group reports are lists
+    for item in (analysis_data if isinstance(analysis_data, list) else [analysis_data]):
+        item.get('report', item).pop('timings', None)
+
+    # Convert the dictionary to a JSON string for the AI prompt
+    analysis_json_string = json.dumps(analysis_data)
+
+    # Get the user-friendly summary from the AI model
+    timings = StageTimings(ANALYSIS_TIMINGS)
+    t = timings.start()
+    ai_summary = get_ai_summary(analysis_json_string)
+    timings.record('llm_summary', t)
+    timings.log(task_id=task_id)
+    # Logged for every job, not only with ANALYSIS_TIMINGS, to watch the hit rate in production
+    logger.info(json.dumps(dict(event='summary_cache', task_id=task_id, **summary_cache.stats())))
+    return ai_summary
@@ -0,0 +1,84 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from backend.ml.video_engine.disk_lru import DiskLRU
+
+class SummaryCache:
+    """
+    Two-tier cache of AI summaries: an in-process LRU of up to max_entries in
+    front of a directory of small JSON files shared by every process.
+
+    Entries expire ttl seconds after they were generated, in both tiers.
+    Disk reads refresh an entry's mtime, and writes evict least-recently-used
+    files until the directory fits in max_bytes (see DiskLRU). stats() counts
+    hits per tier and misses, for this process.
+    """
+    def __init__(self, cache_dir: str, max_entries: int = 256, max_bytes: int = 64 * 1024**2,
+                 ttl: float = 7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict() # key -> (created_at, summary), least recently used first
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        self._disk = DiskLRU(cache_dir, '.json', max_bytes, max_age=ttl)
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Hashes JSON-serialisable parts (e.g. a canonical report and a prompt version) into a cache key."""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached summary, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+        path = self._disk.path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            created_at, summary = data["created_at"], data["summary"]
+        except (OSError, ValueError, KeyError):
+            created_at, summary = None, None
+        if summary is not None and now - created_at > self.ttl:
+            self._disk.remove(path)
+            summary = None
+
+        with self._lock:
+            if summary is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._remember(key, created_at, summary)
+        self._disk.touch(key)
+        return summary
+
+    def put(self, key: str, summary: str):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, summary)
+            self._stats["stores"] += 1
+
+        self._disk.write(key, lambda f: json.dump({"created_at": created_at, "summary": summary}, f), mode='w')
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, memory_entries=len(self._memory))
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 3) if lookups else None
+        return stats
+
+    def _remember(self, key: str, created_at: float, summary: str):
+        self._memory[key] = (created_at, summary)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
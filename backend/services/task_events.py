@@ -0,0 +1,76 @@
+import asyncio
+from starlette.concurrency import run_in_threadpool
+from backend.services.job_queue import JobQueue
+
+TERMINAL_STATES = ("complete", "failed")
+
+def task_status(job: dict) -> dict:
+    """The client-facing status of a job: result is the summary once complete, or the error once failed."""
+    result = job["error"] if job["status"] == "failed" else job["result"]
+    return {"status": job["status"], "result": result, "progress": round(job["progress"], 3)}
+
+class TaskEvents:
+    """
+    Pushes task status changes to any number of waiting clients from one
+    event loop. Workers write status to the job queue; while anyone is
+    subscribed, a single poller reads every watched task in one batched
+    query each interval and hands changes to the subscribers' queues, so the
+    database load doesn't grow with the number of clients per task and
+    nothing is polled while no one is waiting.
+    """
+    def __init__(self, job_queue: JobQueue, interval: float = 0.5):
+        self.job_queue = job_queue
+        self.interval = interval
+        self._subscribers = {} # task id -> set of asyncio.Queue
+        self._last = {} # task id -> last status pushed
+        self._poller = None
+
+    async def subscribe(self, task_id: str, keepalive: float = None):
+        """
+        Yields the task's current status, then every change to it, and stops
+        after a terminal state (complete / failed). Yields nothing if the task
+        doesn't exist. With keepalive, None is yielded after that many seconds
+        without a change, so the caller can keep idle connections open.
+        """
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        try:
+            job = await run_in_threadpool(self.job_queue.get, task_id)
+            if job is None: return
+            status = task_status(job)
+            yield status
+            if status["status"] in TERMINAL_STATES: return
+
+            if self._poller is None or self._poller.done():
+                self._poller = asyncio.create_task(self._poll())
+            while True:
+                try:
+                    new_status = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if new_status == status: continue
+                status = new_status
+                yield status
+                if status["status"] in TERMINAL_STATES: return
+        finally:
+            subscribers = self._subscribers[task_id]
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[task_id]
+                self._last.pop(task_id, None)
+
+    async def _poll(self):
+        while self._subscribers:
+            await asyncio.sleep(self.interval)
+            try:
+                jobs = await run_in_threadpool(self.job_queue.get_many, list(self._subscribers))
+            except Exception as e:
+                print(f"Could not read task statuses: {e}")
+                continue
+            for task_id, job in jobs.items():
+                status = task_status(job)
+                if self._last.get(task_id) == status or task_id not in self._subscribers: continue
+                self._last[task_id] = status
+                for queue in self._subscribers[task_id]:
+                    queue.put_nowait(status)
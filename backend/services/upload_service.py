@@ -0,0 +1,326 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import cv2
+try:
+    import fcntl
+except ImportError: # Windows: no cross-process locking of PATCH requests
+    fcntl = None
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+CHUNK_SIZE = 1024 * 1024 # Bytes written to disk at a time
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "1024")) * 1024 * 1024
+MAX_VIDEO_SECONDS = float(os.getenv("MAX_VIDEO_SECONDS", "3600"))
+MAX_FIELD_BYTES = 1024 # Plain form fields are short (exercise type, options)
+UPLOAD_EXPIRY_SECONDS = float(os.getenv("UPLOAD_EXPIRY_HOURS", "24")) * 3600
+UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def sanitize_filename(filename, default: str = "upload") -> str:
+    """Keeps the base name of a client-supplied filename, restricted to safe characters."""
+    name = os.path.basename((filename or "").replace("\\", "/"))
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", name).lstrip(".")[-100:]
+    return name or default
+
+
+def _multipart_events(boundary: bytes, events: list) -> MultipartParser:
+    """A python-multipart parser that appends (event, value) tuples to events."""
+    header = [bytearray(), bytearray()]
+
+    def on_header_end():
+        events.append(("header", (bytes(header[0]).lower(), bytes(header[1]))))
+        header[0].clear(); header[1].clear()
+
+    return MultipartParser(boundary, {
+        "on_part_begin": lambda: events.append(("begin", None)),
+        "on_header_field": lambda data, start, end: header[0].extend(data[start:end]),
+        "on_header_value": lambda data, start, end: header[1].extend(data[start:end]),
+        "on_header_end": on_header_end,
+        "on_part_data": lambda data, start, end: events.append(("data", bytes(data[start:end]))),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+
+
+async def receive_file_upload(request: Request, file_field: str, upload_dir: str, prefix: str,
+                              max_bytes: int = MAX_UPLOAD_BYTES):
+    """
+    Streams a multipart/form-data request body straight to disk. The part
+    named file_field is written to upload_dir as `{prefix}_{sanitized
+    filename}` in CHUNK_SIZE writes while its SHA-256 is computed, and the
+    request is rejected (413) as soon as it passes max_bytes, so memory use
+    doesn't grow with the file. Returns (form fields, upload), where upload
+    is a dict with the file's path, filename, size and sha256.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + CHUNK_SIZE:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes // (1024 * 1024)} MB")
+
+    events = []
+    parser = _multipart_events(params[b"boundary"], events)
+    fields, upload = {}, None
+    name = filename = None
+    value, pending = bytearray(), bytearray()
+    file, digest, size = None, hashlib.sha256(), 0
+
+    try:
+        async for body_chunk in request.stream():
+            parser.write(body_chunk)
+            for event, data in events:
+                if event == "begin":
+                    name, filename = None, None
+                    value.clear()
+                elif event == "header" and data[0] == b"content-disposition":
+                    _, options = parse_options_header(data[1])
+                    name = options.get(b"name", b"").decode("utf-8", "replace")
+                    if b"filename" in options: filename = options[b"filename"].decode("utf-8", "replace")
+                elif event == "data" and filename is not None:
+                    if name != file_field or upload is not None:
+                        raise HTTPException(status_code=400, detail=f"Unexpected file field: {name}")
+                    if file is None:
+                        path = os.path.join(upload_dir, f"{prefix}_{sanitize_filename(filename)}")
+                        file = open(path, "wb")
+                    size += len(data)
+                    if size > max_bytes:
+                        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes // (1024 * 1024)} MB")
+                    digest.update(data)
+                    pending.extend(data)
+                    if len(pending) >= CHUNK_SIZE:
+                        await run_in_threadpool(file.write, bytes(pending))
+                        pending.clear()
+                elif event == "data":
+                    value.extend(data)
+                    if len(value) > MAX_FIELD_BYTES:
+                        raise HTTPException(status_code=400, detail=f"Form field too long: {name}")
+                elif event == "end" and filename is not None and name == file_field:
+                    if file is None: # Empty file part
+                        path = os.path.join(upload_dir, f"{prefix}_{sanitize_filename(filename)}")
+                        file = open(path, "wb")
+                    await run_in_threadpool(file.write, bytes(pending))
+                    pending.clear()
+                    file.close()
+                    upload = {"path": path, "filename": filename, "size": size, "sha256": digest.hexdigest()}
+                elif event == "end" and name:
+                    fields[name] = value.decode("utf-8", "replace")
+            events.clear()
+        parser.finalize()
+    except FormParserError as e:
+        _discard(file)
+        raise HTTPException(status_code=400, detail=f"Malformed multipart upload: {e}")
+    except ClientDisconnect:
+        _discard(file)
+        raise HTTPException(status_code=400, detail="The client disconnected during the upload")
+    except BaseException:
+        _discard(file)
+        raise
+
+    if upload is None:
+        _discard(file)
+        raise HTTPException(status_code=400, detail=f"Missing file field: {file_field}")
+    return fields, upload
+
+
+def _discard(file):
+    if file is None: return
+    file.close()
+    if os.path.exists(file.name): os.remove(file.name)
+
+
+def _video_duration(path: str):
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened(): return None
+        frames, fps = cap.get(cv2.CAP_PROP_FRAME_COUNT), cap.get(cv2.CAP_PROP_FPS)
+        return frames / fps if frames > 0 and fps > 0 else 0.0
+    finally:
+        cap.release()
+
+
+async def check_video_upload(path: str, max_seconds: float = MAX_VIDEO_SECONDS):
+    """
+    Rejects (and deletes) a stored upload that OpenCV can't open (400) or whose
+    container reports more than max_seconds of video (413). Only the header is
+    read; streams without a frame count pass.
+    """
+    duration = await run_in_threadpool(_video_duration, path)
+    if duration is None or duration > max_seconds:
+        os.remove(path)
+        if duration is None: raise HTTPException(status_code=400, detail="The upload is not a readable video")
+        raise HTTPException(status_code=413, detail=f"Video is longer than {max_seconds / 60:g} minutes")
+
+
+# --- Resumable uploads ---
+# An upload is a `{id}.part` file that grows as byte ranges arrive, plus a
+# `{id}.json` sidecar with what the client declared at creation. The part
+# file's size is the upload offset, so any API process can serve any request.
+
+def _upload_paths(upload_dir: str, upload_id: str):
+    if not UPLOAD_ID.match(upload_id): raise HTTPException(status_code=404, detail="Upload not found")
+    return os.path.join(upload_dir, f"{upload_id}.part"), os.path.join(upload_dir, f"{upload_id}.json")
+
+
+def create_resumable_upload(upload_dir: str, filename: str, length: int = None, max_bytes: int = MAX_UPLOAD_BYTES, **metadata):
+    """
+    Starts a resumable upload and returns its id. length is the final size in
+    bytes, or None while it isn't known yet (e.g. the recording is still
+    running). metadata is stored for finalize_resumable_upload.
+    """
+    if length is not None and not 0 < length <= max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes // (1024 * 1024)} MB")
+    expire_resumable_uploads(upload_dir)
+
+    upload_id = uuid.uuid4().hex
+    part_path, meta_path = _upload_paths(upload_dir, upload_id)
+    meta = dict(metadata, filename=sanitize_filename(filename), length=length, created_at=time.time())
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    open(part_path, "wb").close()
+    os.replace(meta_path + ".tmp", meta_path)
+    return upload_id
+
+
+def get_resumable_upload(upload_dir: str, upload_id: str) -> dict:
+    """Returns the upload's metadata with its current offset; 404 if it doesn't exist."""
+    part_path, meta_path = _upload_paths(upload_dir, upload_id)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        meta["offset"] = os.path.getsize(part_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return meta
+
+
+async def append_resumable_upload(request: Request, upload_dir: str, upload_id: str, offset: int,
+                                  max_bytes: int = MAX_UPLOAD_BYTES) -> int:
+    """
+    Appends the request body to the upload at offset, which must equal the
+    bytes received so far (409 otherwise; GET the upload to resume from its
+    offset). The body is streamed to the part file in place, and bytes that
+    arrived before a dropped connection are kept. Returns the new offset.
+    """
+    meta = await run_in_threadpool(get_resumable_upload, upload_dir, upload_id)
+    limit = meta["length"] if meta["length"] is not None else max_bytes
+    part_path, _ = _upload_paths(upload_dir, upload_id)
+
+    file = await run_in_threadpool(_open_for_append, part_path, offset)
+    with file:
+        current = offset
+        pending = bytearray()
+        try:
+            async for body_chunk in request.stream():
+                if current + len(pending) + len(body_chunk) > limit:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {limit} bytes")
+                pending.extend(body_chunk)
+                if len(pending) >= CHUNK_SIZE:
+                    await run_in_threadpool(file.write, bytes(pending))
+                    current += len(pending)
+                    pending.clear()
+        except ClientDisconnect:
+            pass # Nobody to answer; the client asks for the offset when it reconnects
+        finally:
+            # Keep what arrived, even if the client went away mid-chunk
+            await run_in_threadpool(file.write, bytes(pending))
+            current += len(pending)
+    return current
+
+
+def _open_for_append(part_path: str, offset: int):
+    """Opens and locks the part file for appending at offset (404 if it's gone, 409 if offset is wrong)."""
+    try:
+        file = open(part_path, "r+b")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    try:
+        _lock_upload(file)
+        if not os.path.exists(part_path): raise HTTPException(status_code=404, detail="Upload not found")
+        current = os.fstat(file.fileno()).st_size
+        if offset != current:
+            raise HTTPException(status_code=409, detail=f"Upload offset is {current}, not {offset}")
+        file.seek(current)
+    except BaseException:
+        file.close()
+        raise
+    return file
+
+
+def _lock_upload(file):
+    """Holds off other requests writing to or finalising the same upload (409 if one is active)."""
+    if fcntl is None: return
+    try:
+        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise HTTPException(status_code=409, detail="Another request is writing to this upload")
+
+
+def delete_resumable_upload(upload_dir: str, upload_id: str):
+    """
+    Deletes an upload's data: 404 if it doesn't exist (or was finalised), 409
+    while another request is writing to or finalising it.
+    """
+    part_path, meta_path = _upload_paths(upload_dir, upload_id)
+    try:
+        file = open(part_path, "rb")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    with file:
+        _lock_upload(file)
+        if not (os.path.exists(part_path) and os.path.exists(meta_path)):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        os.remove(part_path)
+        os.remove(meta_path)
+
+
+def finalize_resumable_upload(upload_dir: str, upload_id: str, prefix: str):
+    """
+    Completes an upload: checks it is whole (the declared length, if any) and
+    renames the part file to `{prefix}_{filename}` in upload_dir, so the data is
+    never copied. Returns (metadata, upload) like receive_file_upload.
+    """
+    part_path, meta_path = _upload_paths(upload_dir, upload_id)
+    try:
+        file = open(part_path, "rb")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    with file:
+        _lock_upload(file)
+        meta = get_resumable_upload(upload_dir, upload_id) # 404 if finalised meanwhile
+        if meta["offset"] == 0:
+            raise HTTPException(status_code=409, detail="Upload is empty: PATCH the video bytes before finalizing")
+        if meta["length"] is not None and meta["offset"] != meta["length"]:
+            raise HTTPException(status_code=409, detail=f"Upload is incomplete ({meta['offset']} of {meta['length'] or '?'} bytes)")
+
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+        path = os.path.join(upload_dir, f"{prefix}_{meta['filename']}")
+        os.replace(part_path, path)
+        os.remove(meta_path)
+    return meta, {"path": path, "filename": meta["filename"], "size": meta["offset"], "sha256": digest.hexdigest()}
+
+
+def expire_resumable_uploads(upload_dir: str, max_age: float = UPLOAD_EXPIRY_SECONDS):
+    """Deletes resumable uploads not written to for max_age seconds."""
+    now = time.time()
+    for name in os.listdir(upload_dir):
+        upload_id, ext = os.path.splitext(name)
+        if ext != ".json" or not UPLOAD_ID.match(upload_id): continue
+        part_path, meta_path = _upload_paths(upload_dir, upload_id)
+        try:
+            last_write = os.path.getmtime(part_path) if os.path.exists(part_path) else os.path.getmtime(meta_path)
+        except FileNotFoundError:
+            continue
+        if now - last_write <= max_age: continue
+        try:
+            delete_resumable_upload(upload_dir, upload_id)
+        except HTTPException:
+            pass # Finalised or resumed meanwhile
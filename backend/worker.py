@@ -0,0 +1,80 @@
+import os
+import time
+import socket
+import logging
+import argparse
+import threading
+from backend.services.ml_video import get_job_queue, run_job, discard_job_input, warm_pose_pool
+from backend.ml.video_engine.pose_pool import spawn_context
+
+PROGRESS_INTERVAL = 0.5 # Minimum seconds between progress writes to the queue
+
+def _progress_writer(job_id: str, worker: str):
+    """A progress callback that records progress (and renews the lease) at most every PROGRESS_INTERVAL."""
+    last_write = [0.0]
+    def report(fraction: float):
+        now = time.monotonic()
+        if now - last_write[0] < PROGRESS_INTERVAL: return
+        last_write[0] = now
+        get_job_queue().heartbeat(job_id, worker, fraction)
+    return report
+
+def _keep_lease(job_id: str, worker: str, stop: threading.Event):
+    """Renews the job's lease while the analysis runs, so long videos aren't handed to another worker."""
+    while not stop.wait(get_job_queue().lease_seconds / 3):
+        if not get_job_queue().heartbeat(job_id, worker): return
+
+def process_job(job: dict, worker: str):
+    """Runs one claimed job and records its outcome in the queue."""
+    print(f"[{worker}] Starting job {job['id']} ({job['kind']}, attempt {job['attempts']}/{job['max_attempts']})")
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_keep_lease, args=(job['id'], worker, stop), daemon=True)
+    heartbeat.start()
+    try:
+        summary = run_job(job, progress=_progress_writer(job['id'], worker))
+    except Exception as e:
+        print(f"[{worker}] An error occurred during analysis for task {job['id']}: {e}")
+        # Bad input (unknown exercise, invalid landmarks) fails the same way every time
+        if not get_job_queue().fail(job['id'], worker, str(e), retry=not isinstance(e, ValueError)):
+            discard_job_input(job)
+        return
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if get_job_queue().complete(job['id'], worker, summary):
+        discard_job_input(job)
+    print(f"[{worker}] Finished job {job['id']}")
+
+def run_worker(worker: str, poll_interval: float = 1.0):
+    """Claims and runs analysis jobs until the process is stopped."""
+    warm_pose_pool()
+    print(f"[{worker}] Waiting for analysis jobs...")
+    while True:
+        job = get_job_queue().claim(worker, on_failed=discard_job_input)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        process_job(job, worker)
+
+def _worker_main(index: int, poll_interval: float):
+    # Stage timings and summary cache stats are logged at INFO as JSON records
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        run_worker(f"{socket.gethostname()}-{os.getpid()}-{index}", poll_interval)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sportify analysis worker: runs queued video analysis jobs.")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("JOB_WORKERS", "1")), help="Number of worker processes (jobs analysed at once).")
+    parser.add_argument("--poll_interval", type=float, default=1.0, help="Seconds between queue polls when idle.")
+    args = parser.parse_args()
+
+    context = spawn_context()
+    workers = [context.Process(target=_worker_main, args=(i, args.poll_interval)) for i in range(args.processes)]
+    for process in workers: process.start()
+    try:
+        for process in workers: process.join()
+    except KeyboardInterrupt:
+        for process in workers: process.join()
@@ -1,15 +1,117 @@
 import streamlit as st
 import os
+import time
 import datetime
 import uuid
+import av
+import cv2
 from streamlit_webrtc import webrtc_streamer, WebRtcMode
 from aiortc.contrib.media import MediaRecorder
 
+# The live counter runs the backend analysis engine inside the Streamlit server,
+# which therefore needs the repository root on PYTHONPATH (see README)
+from backend.ml.video_engine.exercise_logic import EXERCISE_LOGICS
+from backend.ml.video_engine.live import LiveSession, LiveState
+
 # --- Directory for saving recordings ---
 RECORDINGS_DIR = "recordings"
 if not os.path.exists(RECORDINGS_DIR):
     os.makedirs(RECORDINGS_DIR)
 
+VIDEO_HTML_ATTRS = {
+    "style": {
+        "width": "100%",
+        "margin": "0 auto",
+        "border": "5px #A58BB5 solid",
+        "border-radius": "12px",
+    },
+    "autoPlay": True,
+    "controls": False,
+}
+
+
+class LiveRepProcessor:
+    """
+    streamlit_webrtc frame callback that counts reps on the incoming frames
+    under a per-frame latency budget. A frame is dropped (passed through with
+    the last overlay) when it is already more than budget_ms behind its
+    capture time, or when it arrives within budget_ms of the last inference
+    (or within that inference's run time, if it overran), so a slow model
+    never lets latency build up. A pause longer than new_set_after seconds
+    starts a new set.
+    """
+    def __init__(self, exercise, budget_ms=66, new_set_after=5.0):
+        self.exercise = exercise
+        self.budget = budget_ms / 1000
+        self.new_set_after = new_set_after
+        self.session = LiveSession(EXERCISE_LOGICS[exercise]())
+        self.state = LiveState(0, None)
+        self._next_inference = 0.0
+        self._last_frame = 0.0
+        self._clock_offset = None
+
+    def __call__(self, frame: av.VideoFrame) -> av.VideoFrame:
+        image = frame.to_ndarray(format="bgr24")
+        start = time.monotonic()
+        if self._last_frame and start - self._last_frame > self.new_set_after:
+            self.close()
+            self.session = LiveSession(EXERCISE_LOGICS[self.exercise]())
+            self.state = LiveState(0, None)
+            self._clock_offset = None
+        self._last_frame = start
+
+        # Map the frame's presentation time onto our clock; the fastest delivery seen so far counts as zero lag
+        captured = start
+        if frame.time is not None:
+            offset = start - frame.time
+            if self._clock_offset is None or offset < self._clock_offset: self._clock_offset = offset
+            captured = frame.time + self._clock_offset
+
+        if start - captured <= self.budget and start >= self._next_inference:
+            self.state = self.session.process_frame(image, captured)
+            self._next_inference = start + max(self.budget, time.monotonic() - start)
+
+        draw_live_overlay(image, self.state)
+        return av.VideoFrame.from_ndarray(image, format="bgr24")
+
+    def close(self):
+        self.session.close()
+
+
+def draw_live_overlay(image, state: LiveState):
+    """Draws the rep count and active form warnings onto a BGR frame in place."""
+    lines = [(f"Reps: {state.rep_count}", (255, 255, 255))]
+    lines += [(warning.replace("Form Issue: ", ""), (80, 80, 255)) for warning in state.warnings]
+    cv2.rectangle(image, (0, 0), (image.shape[1], 20 + 30 * len(lines)), (40, 40, 40), -1)
+    for i, (text, color) in enumerate(lines):
+        cv2.putText(image, text, (12, 36 + 30 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.8 if i == 0 else 0.6, color, 2, cv2.LINE_AA)
+
+
+def render_live_counter(rtc_configuration):
+    st.info("Live mode counts your reps and flags form issues as you train. Nothing is recorded or stored.")
+    exercise = st.selectbox("Exercise", list(EXERCISE_LOGICS), format_func=str.capitalize)
+
+    key = f"live_processor_{exercise}"
+    if key not in st.session_state:
+        st.session_state[key] = LiveRepProcessor(exercise)
+    processor = st.session_state[key]
+
+    webrtc_ctx = webrtc_streamer(
+        key=f"live-counter-{exercise}",
+        mode=WebRtcMode.SENDRECV,
+        rtc_configuration=rtc_configuration,
+        media_stream_constraints={"video": True, "audio": False},
+        video_html_attrs=VIDEO_HTML_ATTRS,
+        video_frame_callback=processor,
+        async_processing=True,
+    )
+
+    if not webrtc_ctx.state.playing:
+        # Hand the pose model back while the camera is off
+        processor.close()
+        if processor.state.rep_count:
+            st.success(f"Last set: {processor.state.rep_count} reps.")
+
 
 def render_webcam_recorder():
     st.title("🎬 Record Your Exercise Form")
@@ -37,6 +139,11 @@ def render_webcam_recorder():
     # --- 2. Webcam Recorder Component ---
     RTC_CONFIGURATION = {"iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]}
 
+    mode = st.radio("Mode", ["Record for coach review", "Live rep counter"], horizontal=True)
+    if mode == "Live rep counter":
+        render_live_counter(RTC_CONFIGURATION)
+        return
+
     if "temp_video_path" not in st.session_state:
         st.session_state.temp_video_path = os.path.join(
             RECORDINGS_DIR, f"temp_{st.session_state.username}_{uuid.uuid4().hex}.mp4"
@@ -49,16 +156,7 @@ def render_webcam_recorder():
         mode=WebRtcMode.SENDRECV,
         rtc_configuration=RTC_CONFIGURATION,
         media_stream_constraints={"video": True, "audio": False},
-        video_html_attrs={
-            "style": {
-                "width": "100%",
-                "margin": "0 auto",
-                "border": "5px #A58BB5 solid",
-                "border-radius": "12px",
-            },
-            "autoPlay": True,
-            "controls": False,
-        },
+        video_html_attrs=VIDEO_HTML_ATTRS,
         out_recorder_factory=lambda: MediaRecorder(temp_video_path),
     )
 